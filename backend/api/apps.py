@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_finished, request_started
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        if settings.DATABASE_HEALTH_CHECKS:
+            from backend.db import check_connections, mark_connections_used
+            request_started.connect(check_connections)
+            request_finished.connect(mark_connections_used)
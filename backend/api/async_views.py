@@ -0,0 +1,241 @@
+"""Async-версии самых нагруженных GET-эндпоинтов для запуска под ASGI.
+
+Независимые запросы страницы (сама страница, count, отметки избранного и
+списка покупок, затем авторы, ингредиенты и теги) выполняются параллельно
+в пуле потоков, каждый со своим соединением с базой. Ответы совпадают с
+ответами DRF-представлений, которым передаются все остальные запросы:
+не-GET, а также ?fields= и ?expand=.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django_filters.utils import translate_validation
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+
+from ingredients.models import Ingredient
+from recipes.models import Recipe
+from tags.models import Tag
+
+from .authentication import BatchAuthentication
+from .fast_serializers import (IngredientValuesSerializer,
+                               RecipeValuesSerializer, TagValuesSerializer)
+from .filters import IngredientNameFilter, RecipeFilter
+from .pagination import Pagination
+from .renderers import FastJSONRenderer
+from .serializers import get_query_fields
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+# Размер пула ограничивает и число соединений с базой на процесс
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='async-db'
+)
+
+
+async def run(func, *args):
+    """Выполняет синхронную функцию в пуле потоков.
+
+    Соединения потоков пула закрываются по тем же правилам, что и в
+    конце обычного запроса (CONN_MAX_AGE, ошибки соединения).
+    """
+    def call():
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return await sync_to_async(
+        call, thread_sensitive=False, executor=executor
+    )()
+
+
+def render(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type='application/json',
+        status=status
+    )
+
+
+def render_exception(exc):
+    """Как rest_framework.views.exception_handler"""
+    data = exc.detail
+    if not isinstance(data, (list, dict)):
+        data = {'detail': data}
+    response = render(data, exc.status_code)
+    if exc.status_code == 401:
+        response['WWW-Authenticate'] = TokenAuthentication.keyword
+    return response
+
+
+def authenticate(request):
+    """Пользователь пакета /api/batch/ или по заголовку
+    Authorization: Token <key>"""
+    for authenticator in (BatchAuthentication(), TokenAuthentication()):
+        result = authenticator.authenticate(request)
+        if result is not None:
+            return result[0]
+    return AnonymousUser()
+
+
+def filter_queryset(filterset_class, request, queryset):
+    filterset = filterset_class(
+        request.GET, queryset=queryset, request=request
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+def async_read_view(drf_view):
+    """GET обслуживается async-представлением, остальное - drf_view"""
+    def decorator(view):
+        async def wrapper(request, **kwargs):
+            if (
+                request.method != 'GET'
+                or get_query_fields(request) is not None
+                or get_query_fields(request, 'expand') is not None
+            ):
+                return await sync_to_async(drf_view)(request, **kwargs)
+            try:
+                request.user = await run(authenticate, request)
+                return await view(request, **kwargs)
+            except APIException as exc:
+                return render_exception(exc)
+        # csrf_exempt оборачивает функцию в синхронную, поэтому флаг
+        # ставится напрямую; DRF-представления и так освобождены от CSRF
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def paginate(request, rows, serializer):
+    """То же, что Pagination.paginate_queryset + get_paginated_response"""
+    pagination = Pagination()
+    drf_request = Request(request)
+    page_size = pagination.get_page_size(drf_request)
+    page_number = request.GET.get(pagination.page_query_param, 1)
+    try:
+        number = int(page_number)
+    except ValueError:
+        number = None
+    if number is not None and number >= 1:
+        bottom = (number - 1) * page_size
+        count, page_rows, user_data = await asyncio.gather(
+            run(rows.count),
+            run(list, rows[bottom:bottom + page_size]),
+            load(serializer.get_user_loaders())
+        )
+    else:
+        count, user_data = await asyncio.gather(
+            run(rows.count), load(serializer.get_user_loaders())
+        )
+    paginator = Paginator(rows, page_size)
+    paginator.count = count
+    if page_number in pagination.last_page_strings:
+        number = paginator.num_pages
+    try:
+        number = paginator.validate_number(
+            page_number if number is None else number
+        )
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(
+            page_number=page_number, message=str(exc)
+        ))
+    if page_number in pagination.last_page_strings:
+        bottom = (number - 1) * page_size
+        page_rows = await run(list, rows[bottom:bottom + page_size])
+    page_data = await load(serializer.get_page_loaders(page_rows))
+    pagination.page = Page(page_rows, number, paginator)
+    pagination.request = drf_request
+    return {
+        'count': count,
+        'next': pagination.get_next_link(),
+        'previous': pagination.get_previous_link(),
+        'results': serializer.build(page_rows, **user_data, **page_data),
+    }
+
+
+async def load(loaders):
+    """Выполняет загрузчики параллельно, результат - словарь по именам"""
+    results = await asyncio.gather(
+        *(run(loader) for loader in loaders.values())
+    )
+    return dict(zip(loaders, results))
+
+
+@async_read_view(RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def recipe_list(request):
+    serializer = RecipeValuesSerializer({'request': request})
+    queryset = await run(
+        filter_queryset,
+        RecipeFilter,
+        request,
+        Recipe.objects.filter(is_deleted=False)
+    )
+    return render(await paginate(
+        request, serializer.get_rows(queryset), serializer
+    ))
+
+
+@async_read_view(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+async def recipe_detail(request, pk):
+    serializer = RecipeValuesSerializer({'request': request})
+    queryset = await run(
+        filter_queryset,
+        RecipeFilter,
+        request,
+        Recipe.objects.filter(pk=pk, is_deleted=False)
+    )
+    rows, user_data = await asyncio.gather(
+        run(list, serializer.get_rows(queryset)[:1]),
+        load(serializer.get_user_loaders())
+    )
+    if not rows:
+        raise NotFound
+    page_data = await load(serializer.get_page_loaders(rows))
+    return render(serializer.build(rows, **user_data, **page_data)[0])
+
+
+@async_read_view(TagViewSet.as_view({'get': 'list'}))
+async def tag_list(request):
+    serializer = TagValuesSerializer({'request': request})
+    rows = await run(list, serializer.get_rows(Tag.objects.all()))
+    return render(serializer.represent(rows))
+
+
+@async_read_view(TagViewSet.as_view({'get': 'retrieve'}))
+async def tag_detail(request, pk):
+    serializer = TagValuesSerializer({'request': request})
+    rows = await run(
+        list, serializer.get_rows(Tag.objects.filter(pk=pk))[:1]
+    )
+    if not rows:
+        raise NotFound
+    return render(serializer.represent(rows)[0])
+
+
+@async_read_view(IngredientViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def ingredient_list(request):
+    serializer = IngredientValuesSerializer({'request': request})
+    queryset = await run(
+        filter_queryset,
+        IngredientNameFilter,
+        request,
+        Ingredient.objects.all()
+    )
+    rows = await run(list, serializer.get_rows(queryset))
+    return render(serializer.represent(rows))
@@ -0,0 +1,12 @@
+from rest_framework.authentication import BaseAuthentication
+
+
+class BatchAuthentication(BaseAuthentication):
+    """Подзапрос /api/batch/ выполняется от имени отправителя пакета.
+
+    Пакет уже прошёл аутентификацию, поэтому пользователь и токен
+    берутся из него, а не проверяются заново на каждом подзапросе.
+    """
+
+    def authenticate(self, request):
+        return getattr(request, 'batch_auth', None)
@@ -0,0 +1,137 @@
+"""Пакет GET-запросов к API за один HTTP-запрос.
+
+Пользователь определяется один раз по самому пакету и передаётся
+подзапросам через BatchAuthentication. Подзапросы выполняются по очереди
+на соединении запроса или, с parallel, в пуле потоков, каждый со своим
+соединением и копией контекста запроса (счётчики метрик). База для
+чтения выбирается для каждого подзапроса по его методу и cookie
+закрепления, сам пакет клиента за default не закрепляет.
+"""
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import orjson
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from backend.db import use_replicas
+from backend.middleware import ReplicaRoutingMiddleware
+
+from .serializers import BatchSerializer
+
+logger = logging.getLogger('django.request')
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BATCH_THREADS, thread_name_prefix='batch'
+)
+
+# Условные заголовки и тело относятся к самому пакету
+SKIPPED_META = (
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_MATCH',
+    'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_RANGE',
+    'HTTP_IF_UNMODIFIED_SINCE',
+)
+
+
+def make_subrequest(request, path):
+    url = urlsplit(path)
+    subrequest = HttpRequest()
+    subrequest.method = 'GET'
+    subrequest.path = subrequest.path_info = url.path
+    subrequest.META = {
+        key: value for key, value in request.META.items()
+        if key not in SKIPPED_META
+    }
+    subrequest.META.update(
+        REQUEST_METHOD='GET', PATH_INFO=url.path, QUERY_STRING=url.query
+    )
+    subrequest.GET = QueryDict(url.query)
+    subrequest.COOKIES = request.COOKIES
+    subrequest.user = request.user
+    if request.user.is_authenticated:
+        # Анонимный подзапрос проходит обычную аутентификацию без
+        # обращений к базе, а ответы 401 остаются прежними
+        subrequest.batch_auth = (request.user, request.auth)
+    return subrequest
+
+
+def get_body(response):
+    if isinstance(response, Response):
+        return response.data
+    if response.streaming:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return orjson.loads(response.content)
+    return response.content.decode(response.charset)
+
+
+def call(request, path):
+    subrequest = make_subrequest(request, path)
+    try:
+        match = resolve(subrequest.path_info)
+    except Resolver404:
+        return {'path': path, 'status': 404, 'body': {
+            'detail': str(NotFound.default_detail)
+        }}
+    subrequest.resolver_match = match
+    use_replicas(ReplicaRoutingMiddleware.reads_from_replicas(subrequest))
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        response = view(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        # Ошибка одного подзапроса не лишает клиента остальных ответов
+        logger.exception('Internal Server Error: %s', path)
+        return {'path': path, 'status': 500, 'body': {
+            'detail': str(APIException.default_detail)
+        }}
+    return {
+        'path': path,
+        'status': response.status_code,
+        'body': get_body(response),
+    }
+
+
+def call_in_thread(request, path):
+    close_old_connections()
+    try:
+        return call(request, path)
+    finally:
+        use_replicas(False)
+        close_old_connections()
+
+
+class BatchView(APIView):
+    """Выполняет GET-запросы пакета, ответы - в том же порядке.
+
+    Потоковые ответы (файлы) в пакет не попадают, их body - null.
+    """
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        paths = serializer.validated_data['requests']
+        if serializer.validated_data['parallel']:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    call_in_thread, request, path
+                )
+                for path in paths
+            ]
+            results = [future.result() for future in futures]
+        else:
+            results = [call(request, path) for path in paths]
+        return Response({'results': results})
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BigIntegerField, Func, Q
+from django.utils import timezone
+
+from backend.metrics import WRITE_ROWS
+
+from recipes.models import FavoriteRecipes, Recipe, ShoppingList
+from users.models import Follow
+
+from .models import Change
+
+ENTITIES = {
+    Recipe: Change.RECIPE,
+    FavoriteRecipes: Change.FAVORITE,
+    ShoppingList: Change.SHOPPING_CART,
+    Follow: Change.FOLLOW,
+}
+
+
+class TransactionId(Func):
+    """Номер текущей транзакции, 64 бита с эпохой"""
+    template = 'txid_current()'
+    output_field = BigIntegerField()
+
+
+def record_changes(model, action, object_ids, user=None):
+    """Пишет изменения в журнал; вызывается в транзакции самого изменения"""
+    WRITE_ROWS.labels(ENTITIES[model], action).observe(len(object_ids))
+    Change.objects.bulk_create([
+        Change(
+            transaction_id=TransactionId(),
+            entity=ENTITIES[model],
+            object_id=object_id,
+            action=action,
+            user=user
+        ) for object_id in object_ids
+    ])
+
+
+def get_horizon(using):
+    """Граница видимости журнала: xmin снимка базы using.
+
+    Все транзакции с меньшим номером уже завершены, поэтому запись ниже
+    границы не может появиться позже, сколько бы ни длилась записавшая
+    её транзакция. Граница читается из той же базы, что и журнал: на
+    отстающей реплике она меньше, чем на основной.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def is_expired(issued):
+    """Курсор выдан раньше срока хранения журнала"""
+    return issued < timezone.now() - timedelta(
+        days=settings.CHANGES_RETENTION_DAYS
+    )
+
+
+def get_visible_changes(user, horizon, using):
+    visible = Q(user__isnull=True)
+    if user.is_authenticated:
+        visible |= Q(user=user)
+    return Change.objects.using(using).filter(
+        visible, transaction_id__lt=horizon
+    )
+
+
+def get_changes(user, position, limit, horizon, using):
+    """Изменения после позиции (transaction_id, id) в порядке фиксации
+    и признак продолжения"""
+    transaction_id, change_id = position
+    changes = list(get_visible_changes(user, horizon, using).filter(
+        Q(transaction_id__gt=transaction_id)
+        | Q(transaction_id=transaction_id, id__gt=change_id)
+    ).order_by('transaction_id', 'id')[:limit + 1])
+    return changes[:limit], len(changes) > limit
+
+
+def get_last_position(horizon, using):
+    return Change.objects.using(using).filter(
+        transaction_id__lt=horizon
+    ).order_by('-transaction_id', '-id').values_list(
+        'transaction_id', 'id'
+    ).first() or (0, 0)
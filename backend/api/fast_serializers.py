@@ -0,0 +1,182 @@
+from collections import defaultdict
+from functools import partial
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+
+from recipes.membership import get_membership
+from recipes.models import (FavoriteRecipes, Recipe, RecipeIngredients,
+                            ShoppingList)
+from tags.models import Tag
+from users.models import Follow, User
+
+from .serializers import (CustomUserSerializer, IngredientSerializer,
+                          RecipeIngredientsSerializer, TagSerializer)
+
+PLAIN_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.ReadOnlyField,
+)
+
+
+class FlatValuesSerializer:
+    """Представление плоского сериализатора из строк values_list.
+
+    Поля сериализатора один раз переводятся в пути для values_list,
+    строки превращаются в словари без создания экземпляров моделей.
+    Поддерживаются только поля, значения которых отдаются как есть.
+    """
+
+    def __init__(self, serializer_class, exclude=()):
+        self.names, self.lookups = [], []
+        for name, field in serializer_class().fields.items():
+            if name in exclude:
+                continue
+            if not isinstance(field, PLAIN_FIELDS):
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name}: поле '
+                    f'{type(field).__name__} не поддерживается'
+                )
+            self.names.append(name)
+            self.lookups.append(field.source.replace('.', '__'))
+
+    def get_rows(self, queryset, *extra):
+        return queryset.values_list(*extra, *self.lookups)
+
+    def to_representation(self, row):
+        return dict(zip(self.names, row))
+
+
+TAG = FlatValuesSerializer(TagSerializer)
+INGREDIENT = FlatValuesSerializer(IngredientSerializer)
+RECIPE_INGREDIENT = FlatValuesSerializer(RecipeIngredientsSerializer)
+AUTHOR = FlatValuesSerializer(CustomUserSerializer, exclude=('is_subscribed',))
+
+
+class TagValuesSerializer:
+    def __init__(self, context):
+        self.context = context
+
+    def get_rows(self, queryset):
+        return TAG.get_rows(queryset)
+
+    def represent(self, rows):
+        return [TAG.to_representation(row) for row in rows]
+
+
+class IngredientValuesSerializer(TagValuesSerializer):
+    def get_rows(self, queryset):
+        return INGREDIENT.get_rows(queryset)
+
+    def represent(self, rows):
+        return [INGREDIENT.to_representation(row) for row in rows]
+
+
+class RecipeValuesSerializer:
+    """То же представление, что у RecipeSerializer, из values_list.
+
+    Связанные объекты страницы загружаются тремя запросами по id
+    рецептов и авторов, в том же порядке, что и при prefetch_related.
+    Запросы отдаются загрузчиками, чтобы async-представления могли
+    выполнять их параллельно.
+    """
+    fields = ('id', 'name', 'text', 'author', 'image', 'cooking_time')
+
+    def __init__(self, context):
+        self.request = context.get('request')
+        self.user = getattr(self.request, 'user', AnonymousUser())
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def get_rows(self, queryset):
+        self.with_headline = 'search_headline' in queryset.query.annotations
+        lookups = [
+            'author_id' if name == 'author' else name for name in self.fields
+        ]
+        if self.with_headline:
+            lookups += ['name_headline', 'search_headline']
+        return queryset.prefetch_related(None).values_list(*lookups)
+
+    def get_image_url(self, name):
+        if not name:
+            return None
+        url = self.storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def get_authors(self, author_ids):
+        subscribed = set()
+        if self.user.is_authenticated:
+            subscribed = set(Follow.objects.filter(
+                user=self.user, author_id__in=author_ids
+            ).values_list('author_id', flat=True))
+        authors = {}
+        for row in AUTHOR.get_rows(User.objects.filter(id__in=author_ids)):
+            author = AUTHOR.to_representation(row)
+            author['is_subscribed'] = author['id'] in subscribed
+            authors[author['id']] = author
+        return authors
+
+    def get_related(self, serializer, queryset, recipe_field):
+        related = defaultdict(list)
+        for row in serializer.get_rows(queryset, recipe_field):
+            related[row[0]].append(serializer.to_representation(row[1:]))
+        return related
+
+    def get_user_loaders(self):
+        """Запросы, не зависящие от страницы"""
+        return {
+            'favorites': partial(get_membership, FavoriteRecipes, self.user),
+            'shopping_cart': partial(
+                get_membership, ShoppingList, self.user
+            ),
+        }
+
+    def get_page_loaders(self, rows):
+        """Запросы связанных объектов страницы, независимые друг от друга"""
+        recipe_ids = [row[0] for row in rows]
+        return {
+            'authors': partial(self.get_authors, {row[3] for row in rows}),
+            'ingredients': partial(
+                self.get_related,
+                RECIPE_INGREDIENT,
+                RecipeIngredients.objects.filter(recipe_id__in=recipe_ids),
+                'recipe_id'
+            ),
+            'tags': partial(
+                self.get_related,
+                TAG,
+                Tag.objects.filter(recipe__in=recipe_ids),
+                'recipe'
+            ),
+        }
+
+    def represent(self, rows):
+        rows = list(rows)
+        loaders = {**self.get_user_loaders(), **self.get_page_loaders(rows)}
+        return self.build(
+            rows, **{name: load() for name, load in loaders.items()}
+        )
+
+    def build(self, rows, authors, ingredients, tags, favorites,
+              shopping_cart):
+        data = []
+        for row in rows:
+            recipe_id = row[0]
+            recipe = {
+                'id': recipe_id,
+                'name': row[1],
+                'text': row[2],
+                'author': authors[row[3]],
+                'image': self.get_image_url(row[4]),
+                'ingredients': ingredients[recipe_id],
+                'tags': tags[recipe_id],
+                'cooking_time': row[5],
+                'is_favorited': recipe_id in favorites,
+                'is_in_shopping_cart': recipe_id in shopping_cart,
+            }
+            if self.with_headline:
+                recipe['name_headline'] = row[6]
+                recipe['search_headline'] = row[7]
+            data.append(recipe)
+        return data
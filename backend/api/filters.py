@@ -1,8 +1,17 @@
 import django_filters as filters
+from django import forms
+from django.conf import settings
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank)
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
 from django_filters.widgets import BooleanWidget
 
 from ingredients.models import Ingredient
-from recipes.models import Recipe
+from recipes.membership import get_membership
+from recipes.models import FavoriteRecipes, Recipe, ShoppingList
+from recipes.search import SEARCH_CONFIG
+from tags.models import Tag
 from users.models import User
 
 
@@ -20,12 +29,21 @@ class IngredientNameFilter(filters.FilterSet):
         )
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    # id ингредиентов: дробное значение - ошибка 400, а не усечение
+    field_class = forms.IntegerField
+
+
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+    # Варианты из таблицы тегов: AllValuesMultipleFilter собирал их
+    # SELECT DISTINCT по всем рецептам на каждом запросе
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all()
     )
     author = filters.ModelChoiceFilter(
-        queryset=User.objects.all()
+        queryset=User.objects.filter(is_deleted=False)
     )
     is_favorited = filters.BooleanFilter(
         field_name='is_favorited',
@@ -37,6 +55,11 @@ class RecipeFilter(filters.FilterSet):
         method='get_is_in_shopping_cart',
         widget=BooleanWidget()
     )
+    search = filters.CharFilter(method='get_search')
+    ingredients = NumberInFilter(method='get_ingredients')
+    exclude_ingredients = NumberInFilter(method='get_exclude_ingredients')
+    have = NumberInFilter(method='get_have')
+    cooking_time = filters.RangeFilter()
 
     class Meta:
         model = Recipe
@@ -44,17 +67,84 @@ class RecipeFilter(filters.FilterSet):
             'tags',
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search',
+            'ingredients',
+            'exclude_ingredients',
+            'have',
+            'cooking_time'
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # ?have и ?search задают только оценки, порядок собирается здесь:
+        # сначала доля имеющихся ингредиентов, при равной - релевантность
+        scores = [
+            f'-{name}' for name in ('match', 'rank')
+            if name in queryset.query.annotations
+        ]
+        if not scores:
+            return queryset
+        ordering = (*scores, '-pub_date')
+        queryset = queryset.order_by(*ordering)
+        if not self.form.cleaned_data.get('search'):
+            return queryset
+        # База ранжирует все совпадения, но отдаются только
+        # SEARCH_MAX_RESULTS лучших: выборка лучших по рангу - сортировка
+        # top-N без записи на диск. Их id читаются один раз, и подсчёт
+        # для пагинации и страница не ранжируют совпадения заново
+        best = list(queryset.order_by(*ordering).values_list(
+            'id', flat=True
+        )[:settings.SEARCH_MAX_RESULTS])
+        return queryset.filter(id__in=best)
+
+    def filter_membership(self, queryset, model, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            id__in=list(get_membership(model, self.request.user))
         )
 
     def get_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if value:
-            return queryset.filter(recipe_favorites__user=user)
-        return queryset
+        return self.filter_membership(queryset, FavoriteRecipes, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if value:
-            return queryset.filter(recipe_shoppinglist__user=user)
-        return queryset
+        return self.filter_membership(queryset, ShoppingList, value)
+
+    def get_search(self, queryset, name, value):
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            # Название короткое, подсвечиваются все вхождения
+            name_headline=SearchHeadline(
+                'name', query, config=SEARCH_CONFIG,
+                start_sel='<mark>', stop_sel='</mark>', highlight_all=True
+            ),
+            search_headline=SearchHeadline(
+                'text', query, config=SEARCH_CONFIG,
+                start_sel='<mark>', stop_sel='</mark>', max_fragments=2
+            )
+        )
+
+    def get_ingredients(self, queryset, name, value):
+        """Рецепты, в которых есть все перечисленные ингредиенты"""
+        return queryset.filter(ingredient_ids__contains=value)
+
+    def get_exclude_ingredients(self, queryset, name, value):
+        return queryset.exclude(ingredient_ids__overlap=value)
+
+    def get_have(self, queryset, name, value):
+        """Рецепты хотя бы с одним из ингредиентов; match - доля
+        ингредиентов рецепта, которые есть у пользователя"""
+        table = Recipe._meta.db_table
+        return queryset.filter(
+            ingredient_ids__overlap=value
+        ).annotate(match=RawSQL(
+            f'(SELECT count(*) FROM unnest({table}.ingredient_ids) AS id '
+            f'WHERE id = ANY(%s))::float '
+            f'/ greatest(cardinality({table}.ingredient_ids), 1)',
+            (value,),
+            output_field=FloatField()
+        ))
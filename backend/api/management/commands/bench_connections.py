@@ -0,0 +1,91 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.test import RequestFactory
+
+from backend.db import check_connections, mark_connections_used
+
+MODES = (
+    # (название, CONN_MAX_AGE, проверка соединений, порог простоя)
+    ('CONN_MAX_AGE=0', 0, False, None),
+    ('постоянные', 600, False, None),
+    ('проверка каждого', 600, True, 0),
+    ('проверка простоя', 600, True, None),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Время запроса через WSGIHandler при разных режимах соединений '
+        'с базой: без постоянных соединений, с постоянными, с проверкой '
+        'перед каждым запросом и только после простоя'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='/api/tags/',
+            help='Запрашиваемый адрес'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Запросов в каждом режиме'
+        )
+        parser.add_argument(
+            '--host',
+            default=None,
+            help='Заголовок Host, по умолчанию первый из ALLOWED_HOSTS'
+        )
+
+    def run(self, handler, environ, count):
+        """Время каждого запроса в миллисекундах. Обработчик вызывается
+        напрямую: тестовый клиент отключает close_old_connections, и
+        CONN_MAX_AGE на нём не проявляется"""
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = handler(dict(environ), lambda status, headers: None)
+            response.close()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        host = options['host'] or next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        environ = RequestFactory().get(
+            options['path'], HTTP_HOST=host.lstrip('.')
+        ).environ
+        handler = WSGIHandler()
+        idle = settings.DATABASE_HEALTH_CHECK_IDLE
+        request_started.disconnect(check_connections)
+        request_finished.disconnect(mark_connections_used)
+        for name, max_age, health_checks, threshold in MODES:
+            for connection in connections.all():
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+            settings.DATABASE_HEALTH_CHECK_IDLE = (
+                idle if threshold is None else threshold
+            )
+            if health_checks:
+                request_started.connect(check_connections)
+                request_finished.connect(mark_connections_used)
+            # Прогрев: импорты, кеши, первое соединение
+            self.run(handler, environ, 50)
+            timings = sorted(self.run(handler, environ, options['requests']))
+            request_started.disconnect(check_connections)
+            request_finished.disconnect(mark_connections_used)
+            self.stdout.write(
+                f'{name:<18} среднее {statistics.mean(timings):.3f} мс, '
+                f'p50 {timings[len(timings) // 2]:.3f} мс, '
+                f'p95 {timings[len(timings) * 95 // 100]:.3f} мс'
+            )
+        settings.DATABASE_HEALTH_CHECK_IDLE = idle
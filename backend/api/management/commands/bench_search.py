@@ -0,0 +1,116 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api.views import RecipeViewSet
+from recipes.models import Recipe
+from recipes.search import update_search_vector
+from users.models import User
+
+# Названия блюд для описаний: каждое попадает примерно в 1,5% рецептов,
+# COMMON_WORD - в каждый девятый, остальные слова из md5 редкие
+WORDS = (
+    'борщ', 'каша', 'салат', 'пирог', 'омлет', 'плов', 'щи', 'пельмени',
+    'блины', 'солянка', 'котлета', 'запеканка', 'рагу', 'гуляш', 'окрошка',
+    'вареники', 'сырники', 'голубцы', 'уха', 'шашлык',
+)
+COMMON_WORD = 'суп'
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN ANALYZE запросов списка рецептов с ?search= на '
+        'сгенерированной таблице. Данные создаются в транзакции, '
+        'которая откатывается в конце'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1_000_000,
+            help='Сколько рецептов сгенерировать'
+        )
+        parser.add_argument(
+            '--query',
+            action='append',
+            help='Поисковый запрос, можно указать несколько раз'
+        )
+
+    def seed(self, count):
+        author = User.objects.order_by('id').first()
+        started = time.monotonic()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Recipe._meta.db_table} (
+                    name, text, image, cooking_time, pub_date, author_id,
+                    ingredient_ids, is_deleted
+                )
+                SELECT
+                    'bench ' || n,
+                    array_to_string(ARRAY(
+                        SELECT CASE
+                            WHEN random() < 0.004 THEN %s
+                            WHEN random() < 0.01 THEN (%s::text[])[
+                                1 + floor(random() * %s)::int
+                            ]
+                            ELSE 'x' || substr(md5(random()::text), 1, 4)
+                        END
+                        FROM generate_series(1, 30)
+                        WHERE n IS NOT NULL
+                    ), ' '),
+                    '', 1 + n %% 300,
+                    now() - n * interval '1 minute', %s, '{{}}', false
+                FROM generate_series(1, %s) AS n
+                """,
+                [COMMON_WORD, list(WORDS), len(WORDS), author.id, count]
+            )
+        update_search_vector(Recipe.objects.filter(name__startswith='bench '))
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+        self.stdout.write(
+            f'Создано рецептов: {count} за {time.monotonic() - started:.0f} с'
+        )
+
+    def explain(self, query):
+        """Запросы списка, которые выполняет API, и их планы"""
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        request = APIRequestFactory().get(
+            '/api/recipes/', {'search': query}, HTTP_HOST=host.lstrip('.')
+        )
+        request.user = AnonymousUser()
+        view = RecipeViewSet.as_view({'get': 'list'})
+        with CaptureQueriesContext(connection) as context:
+            started = time.monotonic()
+            view(request).render()
+            elapsed = (time.monotonic() - started) * 1000
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'?search={query}: ответ за {elapsed:.1f} мс'
+        ))
+        with connection.cursor() as cursor:
+            for captured in context.captured_queries:
+                if 'search_vector' not in captured['sql']:
+                    continue
+                cursor.execute(f'EXPLAIN ANALYZE {captured["sql"]}')
+                self.stdout.write(captured['sql'])
+                self.stdout.write(
+                    '\n'.join(row[0] for row in cursor.fetchall())
+                )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['recipes'])
+            for query in options['query'] or (
+                COMMON_WORD, WORDS[0], f'{WORDS[1]} {WORDS[2]}'
+            ):
+                self.explain(query)
+            transaction.set_rollback(True)
@@ -0,0 +1,177 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from rest_framework.test import APIRequestFactory
+
+from api.views import IngredientViewSet, RecipeViewSet
+from recipes.models import (FavoriteRecipes, Recipe, RecipeIngredients,
+                            ShoppingList)
+from tags.models import Tag
+from users.models import Follow, User
+
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def view_queryset(viewset, user, params=None, action='list'):
+    """Queryset, который представление строит для GET с параметрами
+    params: get_queryset и фильтры те же, что и в API"""
+    view = viewset(
+        action_map={'get': action}, action=action, format_kwarg=None,
+        args=(), kwargs={}
+    )
+    request = view.initialize_request(
+        APIRequestFactory().get('/', params or {})
+    )
+    request.user = user
+    view.request = request
+    return view.filter_queryset(view.get_queryset())
+
+
+def canonical_queries(user, recipe, tag):
+    """Типовые запросы эндпоинтов из api.views"""
+    ingredient_id = recipe.ingredient_ids[0]
+    word = recipe.name.split()[0]
+
+    def recipes(**params):
+        return view_queryset(RecipeViewSet, user, params)[:settings.PAGE_SIZE]
+
+    return {
+        'recipes-list': recipes(),
+        'recipes-list?author': recipes(author=user.pk),
+        'recipes-list?tags': recipes(tags=tag.slug),
+        'recipes-list?search': recipes(search=word),
+        'recipes-list?ingredients': recipes(ingredients=ingredient_id),
+        'recipes-list?exclude_ingredients': recipes(
+            exclude_ingredients=ingredient_id
+        ),
+        'recipes-list?have': recipes(have=ingredient_id),
+        'recipes-list?is_favorited': recipes(is_favorited=1),
+        'recipes:favorites-membership': (
+            FavoriteRecipes.objects.filter(
+                user=user
+            ).order_by('recipe_id').values_list('recipe_id', flat=True)
+        ),
+        'recipes:shopping-cart-membership': (
+            ShoppingList.objects.filter(
+                user=user
+            ).order_by('recipe_id').values_list('recipe_id', flat=True)
+        ),
+        'recipes-detail': view_queryset(
+            RecipeViewSet, user, action='retrieve'
+        ).filter(pk=recipe.pk),
+        'recipes-detail:ingredients': (
+            RecipeIngredients.objects.filter(
+                recipe=recipe
+            ).select_related('ingredient')
+        ),
+        'recipes-detail:favorited-by': (
+            recipe.recipe_favorites.values('user')
+        ),
+        'recipes-download-shopping-cart': (
+            RecipeIngredients.objects.filter(
+                recipe__recipe_shoppinglist__user=user,
+                recipe__is_deleted=False
+            ).values(
+                'ingredient__name', 'ingredient__measurement_unit'
+            ).annotate(value=Sum('amount')).order_by('ingredient__name')
+        ),
+        'ingredients-list?name': view_queryset(
+            IngredientViewSet, user, {'name': 'а'}
+        ),
+        'ingredients:used-in': (
+            RecipeIngredients.objects.filter(
+                ingredient_id=ingredient_id
+            ).values('recipe')
+        ),
+        'users-subscriptions': (
+            Follow.objects.filter(
+                user=user, author__is_deleted=False
+            )[:settings.PAGE_SIZE]
+        ),
+        'users:followers': Follow.objects.filter(author=user).values('user'),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для типовых запросов API и сообщает '
+            'о последовательном сканировании больших таблиц')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows', type=int, default=10000,
+            help='Таблицы меньшего размера не проверяются'
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Выполнить EXPLAIN ANALYZE'
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найдены проблемы'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            # Фильтры API используют полнотекстовый поиск и массивы,
+            # а размеры таблиц читаются из pg_class
+            self.stdout.write(self.style.WARNING(
+                'Проверка поддерживается только для PostgreSQL'
+            ))
+            return
+        user = User.objects.filter(is_deleted=False).order_by('pk').first()
+        recipe = Recipe.objects.filter(
+            is_deleted=False
+        ).exclude(ingredient_ids=[]).order_by('pk').first()
+        tag = Tag.objects.order_by('pk').first()
+        if None in (user, recipe, tag):
+            raise CommandError(
+                'Нужны хотя бы один пользователь, рецепт с ингредиентами '
+                'и тег'
+            )
+        problems = 0
+        for name, queryset in canonical_queries(user, recipe, tag).items():
+            if self.is_empty(queryset):
+                # Например, ?is_favorited при пустом избранном
+                self.stdout.write(f'{name}: запрос без строк, пропущен')
+                continue
+            plan = queryset.explain(analyze=options['analyze'])
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{name}\n{plan}\n')
+            large_tables = self.large_tables(
+                SEQ_SCAN.findall(plan), options['min_rows']
+            )
+            for table, rows in large_tables:
+                problems += 1
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: Seq Scan on {table} (~{rows} строк)'
+                ))
+            if not large_tables:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+        if problems and options['fail']:
+            raise CommandError(f'Найдено последовательных сканов: {problems}')
+
+    @staticmethod
+    def is_empty(queryset):
+        """Django не отправляет в базу запрос с заведомо пустым
+        результатом, и EXPLAIN для него нечего показать"""
+        try:
+            queryset.query.get_compiler(queryset.db).as_sql()
+        except EmptyResultSet:
+            return True
+        return False
+
+    @staticmethod
+    def large_tables(tables, min_rows):
+        if not tables:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT relname, reltuples::bigint FROM pg_class '
+                'WHERE relname = ANY(%s) AND reltuples >= %s',
+                [list(set(tables)), min_rows]
+            )
+            return cursor.fetchall()
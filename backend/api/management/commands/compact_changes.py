@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from api.models import Change
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из журнала изменений записи старше CHANGES_RETENTION_DAYS '
+        'и записи, перекрытые более поздним изменением того же объекта'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Сколько записей удалять за один запрос'
+        )
+
+    def delete_in_batches(self, queryset, batch_size):
+        deleted = 0
+        while True:
+            ids = list(queryset.order_by().values_list('id', flat=True)[
+                :batch_size
+            ])
+            if not ids:
+                return deleted
+            Change.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = timezone.now() - timedelta(
+            days=settings.CHANGES_RETENTION_DAYS
+        )
+        expired = self.delete_in_batches(
+            Change.objects.filter(created__lt=cutoff), batch_size
+        )
+        # Более позднее изменение в порядке журнала (transaction_id, id)
+        later = Change.objects.filter(
+            Q(transaction_id__gt=OuterRef('transaction_id'))
+            | Q(transaction_id=OuterRef('transaction_id'), id__gt=OuterRef('id')),
+            entity=OuterRef('entity'),
+            object_id=OuterRef('object_id')
+        )
+        superseded = self.delete_in_batches(
+            Change.objects.filter(user__isnull=True).filter(
+                Exists(later.filter(user__isnull=True))
+            ),
+            batch_size
+        ) + self.delete_in_batches(
+            Change.objects.filter(user__isnull=False).filter(
+                Exists(later.filter(user=OuterRef('user')))
+            ),
+            batch_size
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено устаревших записей: {expired}, '
+            f'перекрытых: {superseded}'
+        ))
@@ -0,0 +1,132 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.changes import TransactionId, record_changes
+from api.models import Change
+from recipes.feed import change_followers_count
+from recipes.models import (FavoriteRecipes, FeedEntry, Recipe,
+                            RecipeIngredients, RecipeTags, ShoppingList)
+from users.models import Follow, User
+
+RECIPE_RELATED = (
+    RecipeIngredients, RecipeTags, FavoriteRecipes, ShoppingList, FeedEntry,
+)
+USER_RELATED = (FavoriteRecipes, ShoppingList, FeedEntry, Change)
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пачками рецепты и пользователей, помеченных удалёнными, '
+        'вместе с зависимыми строками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк удалять за один запрос'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Пауза между запросами в секундах'
+        )
+
+    def delete_in_batches(self, queryset, *fields, record=None):
+        """DELETE ... WHERE id IN (...) по batch_size строк.
+
+        Каждая пачка - отдельная транзакция, поэтому блокировки держатся
+        недолго, а прерванная команда при повторном запуске продолжит
+        с того же места. record(rows) вызывается в транзакции пачки
+        со строками (id, *fields).
+        """
+        model = queryset.model
+        deleted = 0
+        while True:
+            rows = list(queryset.order_by().values_list('id', *fields)[
+                :self.batch_size
+            ])
+            if not rows:
+                return deleted
+            with transaction.atomic():
+                model.objects.filter(id__in=[row[0] for row in rows]).delete()
+                if record is not None:
+                    record(rows)
+            deleted += len(rows)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {deleted}'
+            )
+            time.sleep(self.pause)
+
+    def purge_recipes(self, recipes):
+        """Сначала зависимые строки, затем сами рецепты; на последнем
+        шаге каскад Django находит только пустые таблицы. Удаление
+        рецепта ещё раз пишется в журнал: так о нём узнают и клиенты,
+        пропустившие пометку, и рецепты, помеченные в обход deletion"""
+        purged = 0
+        while True:
+            recipe_ids = list(recipes.order_by('id').values_list(
+                'id', flat=True
+            )[:self.batch_size])
+            if not recipe_ids:
+                return purged
+            for model in RECIPE_RELATED:
+                self.delete_in_batches(
+                    model.objects.filter(recipe_id__in=recipe_ids)
+                )
+            with transaction.atomic():
+                Recipe.objects.filter(id__in=recipe_ids).delete()
+                record_changes(Recipe, Change.DELETE, recipe_ids)
+            purged += len(recipe_ids)
+            self.stdout.write(f'{Recipe._meta.verbose_name_plural}: {purged}')
+            time.sleep(self.pause)
+
+    def purge_user(self, user_id):
+        # Рецепты, созданные запросами, которые шли во время удаления
+        self.purge_recipes(Recipe.objects.filter(author_id=user_id))
+        for model in USER_RELATED:
+            self.delete_in_batches(model.objects.filter(user_id=user_id))
+
+        self.delete_in_batches(
+            Follow.objects.filter(user_id=user_id),
+            'author_id',
+            record=lambda rows: change_followers_count(
+                [author_id for _, author_id in rows], -1
+            )
+        )
+
+        def record(rows):
+            # Подписчики узнают об исчезнувшей подписке из журнала
+            Change.objects.bulk_create([
+                Change(
+                    transaction_id=TransactionId(),
+                    entity=Change.FOLLOW,
+                    object_id=user_id,
+                    action=Change.DELETE,
+                    user_id=follower_id
+                ) for _, follower_id in rows
+            ])
+
+        self.delete_in_batches(
+            Follow.objects.filter(author_id=user_id), 'user_id', record=record
+        )
+        User.objects.filter(id=user_id).delete()
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.pause = options['pause']
+        recipes = self.purge_recipes(Recipe.objects.filter(is_deleted=True))
+        users = 0
+        for user_id in User.objects.filter(
+            is_deleted=True
+        ).order_by('id').values_list('id', flat=True):
+            self.purge_user(user_id)
+            users += 1
+            self.stdout.write(f'{User._meta.verbose_name_plural}: {users}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено рецептов: {recipes}, пользователей: {users}'
+        ))
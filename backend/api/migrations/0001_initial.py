@@ -0,0 +1,36 @@
+# Generated by Django 3.2.15 on 2026-10-19 12:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, help_text='Время изменения', verbose_name='Время изменения')),
+                ('entity', models.CharField(choices=[('recipe', 'Рецепт'), ('favorite', 'Избранное'), ('shopping_cart', 'Список покупок'), ('follow', 'Подписка')], help_text='Сущность', max_length=20, verbose_name='Сущность')),
+                ('object_id', models.PositiveIntegerField(help_text='Идентификатор рецепта или автора', verbose_name='Идентификатор объекта')),
+                ('action', models.CharField(choices=[('upsert', 'Создание или изменение'), ('delete', 'Удаление')], help_text='Действие', max_length=10, verbose_name='Действие')),
+                ('user', models.ForeignKey(blank=True, help_text='Пользователь, которому видно изменение', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['entity', 'object_id', 'user', 'id'], name='change_object_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.15 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0, editable=False, help_text='txid_current() транзакции, записавшей изменение', verbose_name='Транзакция'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['transaction_id', 'id'], name='change_transaction_idx'),
+        ),
+    ]
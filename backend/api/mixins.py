@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.http import Http404
+from rest_framework.response import Response
+
+from .serializers import get_query_fields
+
+
+class FastReadMixin:
+    """list и retrieve через сериализаторы на values_list.
+
+    Включается настройкой API_FAST_READ_SERIALIZERS. Запросы с ?fields=
+    и ?expand= обслуживаются обычными сериализаторами.
+    """
+    fast_serializer_class = None
+
+    def use_fast_read(self):
+        return (
+            settings.API_FAST_READ_SERIALIZERS
+            and get_query_fields(self.request) is None
+            and get_query_fields(self.request, 'expand') is None
+        )
+
+    def get_fast_serializer(self):
+        return self.fast_serializer_class(self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_read():
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_fast_serializer()
+        rows = serializer.get_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.represent(page))
+        return Response(serializer.represent(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        # Для безопасных методов объектные права проекта всегда
+        # разрешают чтение, поэтому экземпляр модели не нужен.
+        if not self.use_fast_read():
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        serializer = self.get_fast_serializer()
+        try:
+            rows = list(serializer.get_rows(
+                self.filter_queryset(self.get_queryset()).filter(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                )
+            )[:1])
+        except (TypeError, ValueError):
+            raise Http404
+        if not rows:
+            raise Http404
+        return Response(serializer.represent(rows)[0])
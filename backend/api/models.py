@@ -0,0 +1,85 @@
+from django.db import models
+
+from users.models import User
+
+
+class Change(models.Model):
+    """Запись журнала изменений для инкрементальной синхронизации.
+
+    Изменения рецептов видны всем (user пустой), изменения избранного,
+    списка покупок и подписок видны только их владельцу. Журнал
+    упорядочен по (transaction_id, id): номер транзакции, в отличие от
+    id и created, не позволяет записи зафиксироваться позади курсора.
+    """
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    FOLLOW = 'follow'
+    ENTITY_CHOICES = (
+        (RECIPE, 'Рецепт'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (FOLLOW, 'Подписка'),
+    )
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Время изменения',
+        help_text='Время изменения'
+    )
+    transaction_id = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Транзакция',
+        help_text='txid_current() транзакции, записавшей изменение'
+    )
+    entity = models.CharField(
+        max_length=20,
+        choices=ENTITY_CHOICES,
+        verbose_name='Сущность',
+        help_text='Сущность'
+    )
+    object_id = models.PositiveIntegerField(
+        verbose_name='Идентификатор объекта',
+        help_text='Идентификатор рецепта или автора'
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=ACTION_CHOICES,
+        verbose_name='Действие',
+        help_text='Действие'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='changes',
+        verbose_name='Владелец',
+        help_text='Пользователь, которому видно изменение'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('entity', 'object_id', 'user', 'id'),
+                name='change_object_idx'
+            ),
+            models.Index(
+                fields=('transaction_id', 'id'),
+                name='change_transaction_idx'
+            ),
+        ]
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.entity} {self.object_id}: {self.action}'
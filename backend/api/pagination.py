@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.pagination import (PageNumberPagination,
+                                       _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from backend.settings import PAGE_SIZE
 
@@ -6,3 +14,99 @@ from backend.settings import PAGE_SIZE
 class Pagination(PageNumberPagination):
     page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class FeedPagination:
+    """Keyset-пагинация по позиции (pub_date, recipe_id)"""
+    page_size = PAGE_SIZE
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pub_date, recipe_id = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split(',')
+            position = parse_datetime(pub_date), int(recipe_id)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound('Неверный курсор')
+        if position[0] is None:
+            raise NotFound('Неверный курсор')
+        return position
+
+    def encode_cursor(self, position):
+        pub_date, recipe_id = position
+        return urlsafe_b64encode(
+            f'{pub_date.isoformat()},{recipe_id}'.encode()
+        ).decode()
+
+    def get_paginated_response(self, request, data, last_position):
+        next_link = None
+        if last_position is not None:
+            next_link = replace_query_param(
+                request.build_absolute_uri(),
+                self.cursor_query_param,
+                self.encode_cursor(last_position)
+            )
+        return Response({'next': next_link, 'results': data})
+
+
+class CursorExpired(APIException):
+    status_code = 410
+    default_detail = 'Курсор устарел, загрузите данные заново'
+    default_code = 'cursor_expired'
+
+
+class ChangesPagination(FeedPagination):
+    """Курсор журнала изменений: позиция последней отданной записи
+    (transaction_id, id) и время выдачи"""
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'since'
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            parts = urlsafe_b64decode(cursor.encode()).decode().split(',')
+            if len(parts) == 2:
+                # Курсор до появления transaction_id: старые записи
+                # журнала получили transaction_id = 0
+                parts.insert(0, '0')
+            transaction_id, change_id, issued = parts
+            position = (
+                (int(transaction_id), int(change_id)), parse_datetime(issued)
+            )
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound('Неверный курсор')
+        if position[1] is None:
+            raise NotFound('Неверный курсор')
+        return position
+
+    def encode_cursor(self, position):
+        (transaction_id, change_id), issued = position
+        return urlsafe_b64encode(
+            f'{transaction_id},{change_id},{issued.isoformat()}'.encode()
+        ).decode()
+
+    def get_paginated_response(self, data, position, has_more):
+        return Response({
+            'next_cursor': self.encode_cursor(position),
+            'has_more': has_more,
+            'results': data,
+        })
@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if orjson else None
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON в UTF-8 через orjson, если он установлен.
+
+    Без orjson и при запросе отступов (`indent=...`) работает как
+    стандартный JSONRenderer. Типы, которые orjson не сериализует сам
+    (даты, Decimal, ленивые строки), передаются кодировщику DRF, поэтому
+    вывод совпадает со стандартным рендерером.
+    """
+
+    def __init__(self):
+        self.encoder = self.encoder_class()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(
+            data, default=self.encoder.default, option=ORJSON_OPTIONS
+        )
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(
+                b'\xe2\x80\xa8', b'\\u2028'
+            ).replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -1,14 +1,63 @@
 import webcolors
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.db.models import Count
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 
 from ingredients.models import Ingredient
-from recipes.models import Recipe, RecipeIngredients, RecipeTags
+from recipes.feed import fan_out
+from recipes.membership import get_membership
+from recipes.models import (FavoriteRecipes, Recipe, RecipeIngredients,
+                            RecipeTags, ShoppingList)
 from tags.models import Tag
 from users.models import Follow, User
 
+from .models import Change
+
+
+def get_query_fields(request, param='fields'):
+    """Множество имён из параметра запроса вида ?fields=id,name"""
+    if request is None or not request.GET.get(param):
+        return None
+    return set(request.GET[param].split(','))
+
+
+class SparseFieldsMixin:
+    """Выбор полей корневого сериализатора через ?fields= и ?expand=.
+
+    При заданном ?fields= вложенные объекты из compact_fields выводятся
+    как id, если их имя не перечислено в ?expand=.
+    """
+    compact_fields = ()
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        requested = get_query_fields(request)
+        if requested is None or not self.is_root():
+            return fields
+        expanded = get_query_fields(request, 'expand') or set()
+        fields = {
+            name: field for name, field in fields.items()
+            if name in requested
+        }
+        for name in self.compact_fields:
+            if name in fields and name not in expanded:
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True,
+                    many=isinstance(fields[name], serializers.ListSerializer)
+                )
+        return fields
+
 
 class Hex2NameColor(serializers.Field):
     def to_representation(self, value):
@@ -33,7 +82,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SparseFieldsMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -79,7 +128,7 @@ class FollowSerialiser(serializers.ModelSerializer):
         return obj
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
@@ -91,7 +140,7 @@ class RecipeTagsSerializer(serializers.ModelSerializer):
         fields = ('tag', 'recipe')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Вывод ингредиентов"""
 
     class Meta:
@@ -121,8 +170,9 @@ class CreateRecipeIngredientsSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Вывод рецептов"""
+    compact_fields = ('author', 'tags')
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(read_only=True, many=True)
     ingredients = RecipeIngredientsSerializer(
@@ -130,14 +180,33 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     image = Base64ImageField()
     cooking_time = serializers.IntegerField()
-    is_favorited = serializers.BooleanField()
-    is_in_shopping_cart = serializers.BooleanField()
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    name_headline = serializers.CharField(read_only=True)
+    search_headline = serializers.CharField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'name', 'text', 'author', 'image', 'ingredients',
-            'tags', 'cooking_time', 'is_favorited', 'is_in_shopping_cart')
+            'tags', 'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+            'name_headline', 'search_headline')
+
+    def get_membership(self, model):
+        """Множество рецептов пользователя, одно на весь ответ"""
+        key = f'membership_{model._meta.model_name}'
+        if key not in self.context:
+            request = self.context.get('request')
+            self.context[key] = get_membership(
+                model, getattr(request, 'user', AnonymousUser())
+            )
+        return self.context[key]
+
+    def get_is_favorited(self, obj) -> bool:
+        return obj.id in self.get_membership(FavoriteRecipes)
+
+    def get_is_in_shopping_cart(self, obj) -> bool:
+        return obj.id in self.get_membership(ShoppingList)
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -148,6 +217,15 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     )
     image = Base64ImageField()
     cooking_time = serializers.IntegerField()
+    # Уникальность только среди видимых рецептов, как в ограничении
+    # unique_recipe_name
+    name = serializers.CharField(
+        max_length=200,
+        validators=[UniqueValidator(
+            queryset=Recipe.objects.filter(is_deleted=False),
+            message='Рецепт с таким названием уже существует'
+        )]
+    )
 
     class Meta:
         model = Recipe
@@ -200,6 +278,12 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             )
             ingredients_list.append(current_ingredient)
         RecipeIngredients.objects.bulk_create(ingredients_list)
+        recipe.ingredient_ids = sorted({
+            ingredient['id'].id for ingredient in ingredients
+        })
+        Recipe.objects.filter(pk=recipe.pk).update(
+            ingredient_ids=recipe.ingredient_ids
+        )
 
     def create(self, validated_data):
         image = validated_data.pop('image')
@@ -208,6 +292,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(image=image, **validated_data)
         self.add_tag(tags, recipe)
         self.add_ingredient(ingredients, recipe)
+        fan_out(recipe)
         return recipe
 
     def update(self, instance, validated_data):
@@ -227,13 +312,40 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ShortRecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткая форма рецепта"""
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список рецептов для массового добавления и удаления"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT
+    )
+
+
+class BatchSerializer(serializers.Serializer):
+    """Пакет GET-запросов к API"""
+    requests = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS
+    )
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, paths):
+        for path in paths:
+            if not path.startswith('/api/') or path.startswith('/api/batch/'):
+                raise serializers.ValidationError(
+                    f'{path}: в пакете допустимы только пути /api/'
+                )
+        return paths
+
+
 class UserRecipesSerializer(serializers.ModelSerializer):
     """Автор с рецептами"""
     id = serializers.ReadOnlyField(source='author.id')
@@ -267,7 +379,14 @@ class UserRecipesSerializer(serializers.ModelSerializer):
     def get_recipes(self, obj):
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
+        queryset = Recipe.objects.filter(author=obj.author, is_deleted=False)
         if limit is not None:
-            queryset = Recipe.objects.filter(author=obj.author)[:int(limit)]
+            queryset = queryset[:int(limit)]
         return ShortRecipeSerializer(queryset, many=True).data
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    """Изменение в журнале синхронизации"""
+    class Meta:
+        model = Change
+        fields = ('id', 'entity', 'object_id', 'action')
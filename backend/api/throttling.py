@@ -0,0 +1,95 @@
+"""Ограничение частоты дорогих запросов по алгоритму GCRA.
+
+Состояние клиента - одно число в кеше, теоретическое время прибытия
+(TAT) в миллисекундах, которое обновляется атомарным incr. Скорость
+'N/период' из DEFAULT_THROTTLE_RATES означает ведро на N жетонов,
+пополняемое за период. Стоимость запроса задаётся представлением в
+throttle_costs по action: число или функция от запроса; запросы без
+стоимости не ограничиваются. Общий кеш (memcached, redis) даёт общие
+вёдра для всех воркеров, locmem - отдельные в каждом процессе.
+"""
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from recipes.export import get_export_path, is_fresh
+
+
+def limit_cost(request):
+    """Жетон за каждые THROTTLE_ROWS_PER_TOKEN строк в ?limit="""
+    try:
+        limit = int(request.query_params.get('limit', 0))
+    except ValueError:
+        return 0
+    return max(limit, 0) // settings.THROTTLE_ROWS_PER_TOKEN
+
+
+def export_cost(request):
+    """Дорога только сборка архива; проверка готовности и повторный
+    запрос свежего архива почти бесплатны"""
+    if request.method == 'POST' and not is_fresh(
+        get_export_path(request.user)
+    ):
+        return 30
+    return 1
+
+
+class CostThrottle(SimpleRateThrottle):
+    scope = 'expensive'
+    cache_format = 'throttle_gcra_%(scope)s_%(ident)s'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def get_cost(self, request, view):
+        cost = getattr(view, 'throttle_costs', {}).get(
+            getattr(view, 'action', None), 0
+        )
+        if callable(cost):
+            cost = cost(request)
+        # Дороже всего ведра запрос не может стоить, иначе он
+        # не прошёл бы никогда
+        return min(cost, self.num_requests)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        cost = self.get_cost(request, view)
+        if cost <= 0:
+            return True
+        key = self.get_cache_key(request, view)
+        now = int(self.timer() * 1000)
+        increment = self.duration * 1000 * cost // self.num_requests
+        tolerance = self.duration * 1000
+        tat = self.increment(key, increment, now)
+        if tat - increment < now:
+            # Ведро успело наполниться: отсчёт от текущего момента.
+            # При гонке пара одновременных запросов может пройти сверх
+            # нормы, зато клиент не блокируется на время простоя.
+            tat = now + increment
+            self.cache.set(key, tat, self.get_timeout())
+        if tat - now <= tolerance:
+            return True
+        # Отклонённый запрос жетоны не тратит
+        self.cache.decr(key, increment)
+        self.retry_after = (tat - now - tolerance) / 1000
+        return False
+
+    def increment(self, key, delta, now):
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            if self.cache.add(key, now + delta, self.get_timeout()):
+                return now + delta
+            return self.cache.incr(key, delta)
+
+    def get_timeout(self):
+        # incr не продлевает срок ключа; при постоянной нагрузке ведро
+        # сбрасывается не чаще раза в этот срок
+        return max(self.duration * 2, 3600)
+
+    def wait(self):
+        return self.retry_after
@@ -1,14 +1,19 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from backend.db import replica_routing_exempt
+
+from .batch import BatchView
 from .views import (
-    CustomUserViewSet, IngredientViewSet,
+    ChangeViewSet, CustomUserViewSet, IngredientViewSet,
     RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
 
 router = DefaultRouter()
+router.register(r'changes', ChangeViewSet, basename='changes')
 router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'tags', TagViewSet, basename='tags')
@@ -18,6 +23,33 @@ router.register(r'users', CustomUserViewSet, basename='users')
 #     basename='subscriptions')
 
 urlpatterns = [
+    path(
+        'batch/',
+        replica_routing_exempt(BatchView.as_view()),
+        name='batch'
+    ),
+]
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+
+    # Имена совпадают с именами маршрутов router (метрики, reverse)
+    urlpatterns += [
+        path('recipes/', async_views.recipe_list, name='recipes-list'),
+        path(
+            'recipes/<int:pk>/',
+            async_views.recipe_detail,
+            name='recipes-detail'
+        ),
+        path('tags/', async_views.tag_list, name='tags-list'),
+        path('tags/<int:pk>/', async_views.tag_detail, name='tags-detail'),
+        path(
+            'ingredients/',
+            async_views.ingredient_list,
+            name='ingredients-list'
+        ),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,31 +1,98 @@
+import hashlib
+import os
+from urllib.parse import quote
+
 from django.conf import settings
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 
 from recipes.models import RecipeIngredients
 
 
 def get_ingredients_for_shopping(user):
     ingredients = RecipeIngredients.objects.filter(
-        recipe__recipe_shoppinglist__user=user
+        recipe__recipe_shoppinglist__user=user, recipe__is_deleted=False
     ).values(
         'ingredient__name',
         'ingredient__measurement_unit',
     ).annotate(
         value=Sum('amount')
     ).order_by('ingredient__name')
+    lines = ['Список продуктов к покупке:\n']
+    for ingredient in ingredients:
+        lines.append(
+            f'- {ingredient["ingredient__name"]} '
+            f'- {ingredient["value"]} '
+            f'{ingredient["ingredient__measurement_unit"]}\n'
+        )
+    content = ''.join(lines).encode()
+    if settings.USE_X_ACCEL_REDIRECT:
+        return send_file(
+            write_export(content, '.txt'),
+            'text/plain; charset=utf-8',
+            settings.SHOPPING_LIST_FILENAME
+        )
     response = HttpResponse(
+        content,
         content_type='text/plain',
         charset='utf-8',
     )
     response['Content-Disposition'] = (
         f'attachment; filename={settings.SHOPPING_LIST_FILENAME}'
     )
-    response.write('Список продуктов к покупке:\n')
-    for ingredient in ingredients:
-        response.write(
-            f'- {ingredient["ingredient__name"]} '
-            f'- {ingredient["value"]} '
-            f'{ingredient["ingredient__measurement_unit"]}\n'
+    return response
+
+
+def write_export(content, extension):
+    """Сохраняет сгенерированный файл в EXPORTS_DIR под именем-хешем"""
+    directory = os.path.join(settings.MEDIA_ROOT, settings.EXPORTS_DIR)
+    path = os.path.join(
+        directory, f'{hashlib.sha256(content).hexdigest()}{extension}'
+    )
+    try:
+        # Время использования для очистки в gc_media
+        os.utime(path)
+    except FileNotFoundError:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    return path
+
+
+def send_file(path, content_type, filename=None):
+    """Ответ с файлом из MEDIA_ROOT.
+
+    При USE_X_ACCEL_REDIRECT тело отдаёт nginx, а воркер освобождается
+    сразу после ответа с заголовком.
+    """
+    if settings.USE_X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(
+            settings.X_ACCEL_REDIRECT_LOCATION
+            + os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
         )
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        del response['Content-Disposition']
+    if filename is not None:
+        response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
+
+
+def get_accepted_encodings(request):
+    """Кодировки из Accept-Encoding, которые клиент не запретил через q=0"""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding.strip():
+            accepted.add(coding.strip().lower())
+    return accepted
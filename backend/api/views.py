@@ -1,7 +1,14 @@
+import os
 from http import HTTPStatus
 
-from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Prefetch
+from django.http import HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import filters, status, viewsets
@@ -10,34 +17,55 @@ from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from ingredients.models import Ingredient
-from recipes.models import FavoriteRecipes, Recipe, ShoppingList
+from ingredients.snapshot import (build_snapshot, get_snapshot_path,
+                                  get_snapshot_version)
+from recipes.deletion import delete_recipes, delete_users
+from recipes.export import get_export_path, is_building, start_export
+from recipes.feed import (backfill, change_followers_count, get_feed_page,
+                          remove_author)
+from recipes.membership import invalidate_membership
+from recipes.models import (FavoriteRecipes, Recipe, RecipeIngredients,
+                            ShoppingList)
 from tags.models import Tag
 from users.models import Follow, User
 
+from .changes import (get_changes, get_horizon, get_last_position,
+                      is_expired, record_changes)
+from .fast_serializers import (IngredientValuesSerializer,
+                               RecipeValuesSerializer, TagValuesSerializer)
 from .filters import IngredientNameFilter, RecipeFilter
-from .pagination import Pagination
+from .mixins import FastReadMixin
+from .models import Change
+from .pagination import (ChangesPagination, CursorExpired, FeedPagination,
+                         Pagination)
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
 from .serializers import (
-    FollowSerialiser, IngredientSerializer, PasswordSerializer,
-    RecipeCreateUpdateSerializer, RecipeSerializer, ShortRecipeSerializer,
-    TagSerializer, CustomUserCreateSerializer, UserRecipesSerializer,
-    CustomUserSerializer
+    ChangeSerializer, FollowSerialiser, IngredientSerializer, PasswordSerializer,
+    RecipeCreateUpdateSerializer, RecipeIdsSerializer, RecipeSerializer,
+    ShortRecipeSerializer, TagSerializer, CustomUserCreateSerializer,
+    UserRecipesSerializer, CustomUserSerializer, get_query_fields
 )
-from .utils import get_ingredients_for_shopping
+from .throttling import export_cost, limit_cost
+from .utils import (get_accepted_encodings, get_ingredients_for_shopping,
+                    send_file)
 
 
 class CustomUserViewSet(UserViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.filter(is_deleted=False)
     serializer_class = CustomUserSerializer
     pagination_class = Pagination
     permission_classes = (AllowAny,)
     search_fields = ('username', 'email')
+    throttle_costs = {'list': limit_cost, 'export': export_cost}
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CustomUserCreateSerializer
         return CustomUserSerializer
 
+    def perform_destroy(self, instance):
+        delete_users(User.objects.filter(pk=instance.pk))
+
     @action(detail=False,
             methods=['post'],
             permission_classes=(IsAuthenticated,))
@@ -63,14 +91,31 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscribe(self, request, id):
-        author = get_object_or_404(User, id=id)
+        author = get_object_or_404(User, id=id, is_deleted=False)
         if request.method == 'POST':
+            with transaction.atomic():
+                follow = Follow.objects.create(
+                    user=request.user, author=author
+                )
+                change_followers_count([author.id], 1)
+                record_changes(
+                    Follow, Change.UPSERT, [author.id], request.user
+                )
             serializer = FollowSerialiser(
-                Follow.objects.create(user=request.user, author=author),
-                context={'request': request}
+                follow, context={'request': request}
             )
+            backfill(request.user, author)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        Follow.objects.filter(user=request.user, author=author).delete()
+        with transaction.atomic():
+            deleted, _ = Follow.objects.filter(
+                user=request.user, author=author
+            ).delete()
+            if deleted:
+                change_followers_count([author.id], -1)
+                record_changes(
+                    Follow, Change.DELETE, [author.id], request.user
+                )
+        remove_author(request.user, author)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -79,77 +124,253 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        queryset = Follow.objects.filter(user=request.user)
+        queryset = Follow.objects.filter(
+            user=request.user, author__is_deleted=False
+        )
         pages = self.paginate_queryset(queryset)
         serializer = UserRecipesSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['GET', 'POST'],
+        url_path='me/export',
+        permission_classes=[IsAuthenticated]
+    )
+    def export(self, request):
+        """ZIP-архив с рецептами, изображениями, списками и подписками.
+
+        POST ставит сборку архива в очередь и отвечает 202, а если
+        свежий архив уже есть - 200. GET отдаёт готовый архив, пока
+        сборка идёт - 202, если архив не запрашивали - 404. Архив один на
+        пользователя в EXPORTS_DIR, старые удаляет gc_media; скачивание
+        при USE_X_ACCEL_REDIRECT воркер не занимает.
+        """
+        if request.method == 'POST':
+            start_export(request.user)
+        if is_building(request.user):
+            return Response(
+                {'status': 'building'}, status=status.HTTP_202_ACCEPTED
+            )
+        if request.method == 'POST':
+            return Response({'status': 'ready'})
+        path = get_export_path(request.user)
+        if not os.path.exists(path):
+            return Response(
+                {'detail': 'Архив не запрошен, отправьте POST'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return send_file(
+            path,
+            'application/zip',
+            f'foodgram-{request.user.username}.zip'
+        )
 
-class IngredientViewSet(viewsets.ModelViewSet):
+
+class IngredientViewSet(FastReadMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    fast_serializer_class = IngredientValuesSerializer
     permission_classes = (AllowAny,)
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     filterset_class = IngredientNameFilter
 
+    @action(detail=False, methods=['GET'])
+    def snapshot(self, request):
+        """Весь каталог одним заранее сжатым файлом с версией в ETag.
+
+        С ?v=<версия> ответ кешируется навсегда, без неё - на
+        SNAPSHOTS_MAX_AGE секунд с проверкой через If-None-Match.
+        """
+        version = get_snapshot_version()
+        try:
+            response = self.snapshot_response(request, version)
+        except FileNotFoundError:
+            # Файлы версии удалили между чтением указателя и отправкой
+            version = build_snapshot()
+            response = self.snapshot_response(request, version)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if request.query_params.get('v') == version:
+            patch_cache_control(
+                response, public=True, max_age=31536000, immutable=True
+            )
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.SNAPSHOTS_MAX_AGE
+            )
+        return response
+
+    @staticmethod
+    def snapshot_response(request, version):
+        etag = f'"{version}"'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            accepted = get_accepted_encodings(request)
+            encoding = next((
+                coding for coding in ('br', 'gzip')
+                if ({coding, '*'} & accepted) and os.path.exists(
+                    get_snapshot_path(version, coding)
+                )
+            ), 'identity')
+            path = get_snapshot_path(version, encoding)
+            if not os.path.exists(path):
+                # При X-Accel-Redirect файл открывает nginx
+                raise FileNotFoundError(path)
+            response = send_file(path, 'application/json')
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        return response
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(FastReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    fast_serializer_class = TagValuesSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.prefetch_related('ingredients', 'tags')
+class RecipeViewSet(FastReadMixin, viewsets.ModelViewSet):
+    queryset = Recipe.objects.filter(is_deleted=False)
+    fast_serializer_class = RecipeValuesSerializer
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = Pagination
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
+    # Декодирование и сохранение изображения, сборка списка покупок
+    throttle_costs = {
+        'create': 5,
+        'update': 5,
+        'partial_update': 5,
+        'download_shopping_cart': 10,
+    }
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeCreateUpdateSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        record_changes(Recipe, Change.UPSERT, [recipe.id])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        record_changes(Recipe, Change.UPSERT, [recipe.id])
+
+    def perform_destroy(self, instance):
+        delete_recipes(Recipe.objects.filter(pk=instance.pk))
 
     def get_queryset(self):
-        user = self.request.user
+        """Загружает только то, что нужно запрошенным через ?fields= полям"""
         queryset = super().get_queryset()
+        fields = get_query_fields(self.request)
+        expanded = get_query_fields(self.request, 'expand') or set()
 
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    FavoriteRecipes.objects.filter(
-                        user=user, recipe__pk=OuterRef('pk'))
-                ),
-                is_in_shopping_cart=Exists(ShoppingList.objects.filter(
-                    user=user, recipe__pk=OuterRef('pk'))
+        def requested(name):
+            return fields is None or name in fields
+
+        if requested('ingredients'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipe_amount',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredient'
                 )
-            )
-        else:
-            queryset = queryset.annotate(
-                is_favorited=Value(False, output_field=BooleanField()),
-                is_in_shopping_cart=Value(False, output_field=BooleanField())
-            )
+            ))
+        if requested('tags'):
+            queryset = queryset.prefetch_related('tags')
+        if fields is None or 'author' in expanded:
+            queryset = queryset.select_related('author')
+        if not requested('text'):
+            queryset = queryset.defer('text')
         return queryset
 
     @staticmethod
     def add_recipe(model, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(recipe=recipe, user=request.user)
+        recipe = get_object_or_404(Recipe, id=pk, is_deleted=False)
+        with transaction.atomic():
+            model.objects.create(recipe=recipe, user=request.user)
+            record_changes(model, Change.UPSERT, [recipe.id], request.user)
+            invalidate_membership(model, request.user)
         serializer = ShortRecipeSerializer(recipe)
         return Response(data=serializer.data, status=HTTPStatus.CREATED)
 
     @staticmethod
     def delete_recipe(model, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.filter(recipe=recipe, user=request.user).delete()
+        recipe = get_object_or_404(Recipe, id=pk, is_deleted=False)
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                recipe=recipe, user=request.user
+            ).delete()
+            if deleted:
+                record_changes(
+                    model, Change.DELETE, [recipe.id], request.user
+                )
+                invalidate_membership(model, request.user)
         return Response(status=HTTPStatus.NO_CONTENT)
 
+    @staticmethod
+    def get_recipe_ids(request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return set(serializer.validated_data['recipes'])
+
+    @classmethod
+    def add_recipes(cls, model, request):
+        recipe_ids = cls.get_recipe_ids(request)
+        with transaction.atomic():
+            found = set(Recipe.objects.filter(
+                id__in=recipe_ids, is_deleted=False
+            ).order_by().values_list('id', flat=True))
+            already_added = set(model.objects.filter(
+                user=request.user, recipe_id__in=found
+            ).values_list('recipe_id', flat=True))
+            model.objects.bulk_create(
+                [model(user=request.user, recipe_id=recipe_id)
+                 for recipe_id in found - already_added],
+                ignore_conflicts=True
+            )
+            record_changes(
+                model, Change.UPSERT, sorted(found - already_added),
+                request.user
+            )
+            invalidate_membership(model, request.user)
+        return Response(data={
+            'added': len(found - already_added),
+            'already_added': len(already_added),
+            'not_found': sorted(recipe_ids - found),
+        }, status=HTTPStatus.OK)
+
+    @classmethod
+    def delete_recipes(cls, model, request):
+        recipe_ids = cls.get_recipe_ids(request)
+        return Response(
+            data={'removed': cls.remove_recipes(model, request, recipe_ids)},
+            status=HTTPStatus.OK
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def remove_recipes(model, request, recipe_ids=None):
+        """Удаляет рецепты пользователя из списка и пишет их в журнал"""
+        queryset = model.objects.filter(user=request.user)
+        if recipe_ids is not None:
+            queryset = queryset.filter(recipe_id__in=recipe_ids)
+        removed = list(queryset.select_for_update().values_list(
+            'recipe_id', flat=True
+        ))
+        model.objects.filter(
+            user=request.user, recipe_id__in=removed
+        ).delete()
+        record_changes(model, Change.DELETE, removed, request.user)
+        invalidate_membership(model, request.user)
+        return len(removed)
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
@@ -160,6 +381,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_recipe(FavoriteRecipes, request, pk)
         return self.delete_recipe(FavoriteRecipes, request, pk)
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_bulk(self, request):
+        if request.method == 'POST':
+            return self.add_recipes(FavoriteRecipes, request)
+        return self.delete_recipes(FavoriteRecipes, request)
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
@@ -180,6 +412,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_recipe(ShoppingList, request, pk)
         return self.delete_recipe(ShoppingList, request, pk)
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request):
+        if request.method == 'POST':
+            return self.add_recipes(ShoppingList, request)
+        return self.delete_recipes(ShoppingList, request)
+
+    @action(
+        detail=False,
+        methods=['DELETE'],
+        url_path='shopping_cart/clear',
+        permission_classes=[IsAuthenticated]
+    )
+    def clear_shopping_cart(self, request):
+        return Response(
+            data={'removed': self.remove_recipes(ShoppingList, request)},
+            status=HTTPStatus.OK
+        )
+
     @action(
         detail=False,
         methods=['GET'],
@@ -188,3 +443,68 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         user = request.user
         return get_ingredients_for_shopping(user)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        positions, has_more = get_feed_page(
+            request.user,
+            paginator.decode_cursor(request),
+            paginator.get_page_size(request)
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in positions]
+        )
+        serializer = RecipeSerializer(
+            [recipes[recipe_id] for _, recipe_id in positions
+             if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(
+            request, serializer.data, positions[-1] if has_more else None
+        )
+
+
+class ChangeViewSet(viewsets.GenericViewSet):
+    """Журнал изменений для инкрементальной синхронизации.
+
+    Без ?since= отдаёт только курсор текущего конца журнала: клиент
+    загружает данные целиком и дальше запрашивает изменения по курсору.
+    """
+    serializer_class = ChangeSerializer
+    pagination_class = ChangesPagination
+    permission_classes = (AllowAny,)
+
+    def list(self, request):
+        paginator = self.pagination_class()
+        # Граница и записи читаются из одной базы
+        using = router.db_for_read(Change)
+        horizon = get_horizon(using)
+        issued = timezone.now()
+        cursor = paginator.decode_cursor(request)
+        if cursor is None:
+            return paginator.get_paginated_response(
+                [], (get_last_position(horizon, using), issued), False
+            )
+        position, cursor_issued = cursor
+        if is_expired(cursor_issued):
+            raise CursorExpired
+        changes, has_more = get_changes(
+            request.user,
+            position,
+            paginator.get_page_size(request),
+            horizon,
+            using
+        )
+        if changes:
+            position = changes[-1].transaction_id, changes[-1].id
+        return paginator.get_paginated_response(
+            self.get_serializer(changes, many=True).data,
+            (position, issued),
+            has_more
+        )
@@ -0,0 +1,68 @@
+import random
+import time
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import connections
+
+_state = Local()
+
+
+def use_replicas(enabled):
+    """Разрешает или запрещает чтение с реплик в текущем запросе"""
+    _state.use_replicas = enabled
+
+
+def replicas_enabled():
+    return getattr(_state, 'use_replicas', False)
+
+
+def replica_routing_exempt(view):
+    """Представление само выбирает базу для своих подзапросов, поэтому
+    небезопасный запрос к нему не закрепляет клиента за default"""
+    view.replica_routing_exempt = True
+    return view
+
+
+class PrimaryReplicaRouter:
+    """Чтение безопасных запросов с реплик, запись и миграции - в default"""
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and replicas_enabled():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def check_connections(**kwargs):
+    """Закрывает постоянные соединения, которые больше не отвечают.
+
+    SELECT 1 выполняется только для соединений, простоявших без запросов
+    дольше DATABASE_HEALTH_CHECK_IDLE секунд: недавно работавшее
+    соединение почти наверняка живо, а проверка перед каждым запросом
+    добавляла бы обмен с базой к каждому дешёвому эндпоинту.
+    """
+    idle_since = time.monotonic() - settings.DATABASE_HEALTH_CHECK_IDLE
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and getattr(connection, 'last_used', 0) < idle_since
+            and not connection.is_usable()
+        ):
+            connection.close()
+
+
+def mark_connections_used(**kwargs):
+    """Время последнего запроса для check_connections"""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_used = now
@@ -0,0 +1,123 @@
+"""Метрики Prometheus.
+
+Под gunicorn с PROMETHEUS_MULTIPROC_DIR каждый воркер пишет значения
+в свои mmap-файлы, а /metrics суммирует файлы всех воркеров.
+"""
+import ipaddress
+import os
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса',
+    ('method', 'route', 'status'),
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_db_queries',
+    'Число запросов к базе за один запрос',
+    ('route',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float('inf')),
+)
+REQUEST_DB_TIME = Histogram(
+    'foodgram_request_db_duration_seconds',
+    'Суммарное время запросов к базе за один запрос',
+    ('route',),
+    buckets=(
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+        2.5, float('inf'),
+    ),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests',
+    'Обращения к кешу',
+    ('cache', 'result'),
+)
+WRITE_ROWS = Histogram(
+    'foodgram_write_rows',
+    'Число строк в одной записи избранного, списка покупок и др.',
+    ('entity', 'action'),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+)
+# Загрузка воркеров: занятые потоки относительно их общего числа
+REQUESTS_IN_PROGRESS = Gauge(
+    'foodgram_requests_in_progress',
+    'Запросы в обработке',
+    multiprocess_mode='livesum',
+)
+WORKER_THREADS = Gauge(
+    'foodgram_worker_threads',
+    'Потоки воркеров gunicorn',
+    multiprocess_mode='livesum',
+)
+
+_queries = ContextVar('queries', default=None)
+
+
+def start_request():
+    """Число и время запросов к базе текущего запроса.
+
+    Список, а не числа: потоки async-представлений получают копию
+    контекста и изменяют тот же объект. Гистограммы пишутся один раз
+    в конце запроса, запись в файлы multiprocess на каждый запрос
+    к базе обходилась бы дороже.
+    """
+    queries = [0, 0.0]
+    _queries.set(queries)
+    return queries
+
+
+def observe_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries = _queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += time.perf_counter() - start
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_query)
+
+
+connection_created.connect(install_query_wrapper)
+
+
+def record_cache(cache_name, hit):
+    CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def is_internal(request):
+    """Запрос напрямую из внутренней сети, а не через nginx"""
+    if 'HTTP_X_FORWARDED_FOR' in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+def metrics_view(request):
+    if not is_internal(request):
+        raise Http404
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,322 @@
+import asyncio
+import time
+import zlib
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import patch_vary_headers
+
+from api.utils import get_accepted_encodings
+
+from . import metrics
+from .db import use_replicas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'text/', 'image/svg+xml',
+)
+
+
+class ReplicaRoutingMiddleware:
+    """Направляет чтение на реплики и закрепляет клиента за основной базой.
+
+    После небезопасного запроса клиент получает cookie со сроком
+    закрепления, и в течение DB_REPLICA_STICKY_SECONDS его чтение идёт
+    в default, чтобы он видел свои изменения несмотря на отставание реплик.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Под ASGI цепочка остаётся асинхронной
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        self.process_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas(False)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replicas(False)
+        return self.process_response(request, response)
+
+    def process_request(self, request):
+        use_replicas(self.reads_from_replicas(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'replica_routing_exempt', False):
+            request.replica_routing_exempt = True
+
+    def process_response(self, request, response):
+        if (settings.DATABASE_REPLICAS
+                and request.method not in SAFE_METHODS
+                and not getattr(request, 'replica_routing_exempt', False)
+                and response.status_code < 400):
+            sticky_seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                settings.DATABASE_PRIMARY_COOKIE_NAME,
+                str(int(time.time()) + sticky_seconds),
+                max_age=sticky_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @classmethod
+    def reads_from_replicas(cls, request):
+        return (
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in SAFE_METHODS
+            and not cls.is_pinned(request)
+        )
+
+    @staticmethod
+    def is_pinned(request):
+        value = request.COOKIES.get(settings.DATABASE_PRIMARY_COOKIE_NAME)
+        try:
+            return int(value) > time.time()
+        except (TypeError, ValueError):
+            return False
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class CompressionMiddleware:
+    """Сжатие ответов br или gzip по Accept-Encoding.
+
+    Уровни сжатия выбраны для быстрого кодирования. Маленькие ответы,
+    ответы с Content-Encoding и нетекстовые типы не сжимаются; потоковые
+    ответы сжимаются по частям со сбросом буфера после каждой. Параметры
+    для отдельных префиксов путей задаются в COMPRESSION_ROUTES, None
+    выключает сжатие (по умолчанию для админки с CSRF-токенами, BREACH).
+    Потоковый ответ сбрасывается клиенту каждые min_size байт входа.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    @staticmethod
+    def get_options(path):
+        options = {
+            'min_size': settings.COMPRESSION_MIN_SIZE,
+            'gzip_level': settings.COMPRESSION_GZIP_LEVEL,
+            'brotli_quality': settings.COMPRESSION_BROTLI_QUALITY,
+        }
+        prefixes = [
+            prefix for prefix in settings.COMPRESSION_ROUTES
+            if path.startswith(prefix)
+        ]
+        if not prefixes:
+            return options
+        overrides = settings.COMPRESSION_ROUTES[max(prefixes, key=len)]
+        if overrides is None:
+            return None
+        return {**options, **overrides}
+
+    @staticmethod
+    def get_compressor(request, options):
+        accepted = get_accepted_encodings(request)
+        if brotli is not None and 'br' in accepted:
+            return 'br', BrotliCompressor(options['brotli_quality'])
+        if accepted & {'gzip', '*'}:
+            return 'gzip', GzipCompressor(options['gzip_level'])
+        return None, None
+
+    def process_response(self, request, response):
+        if (
+            response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(
+                COMPRESSIBLE_TYPES
+            )
+        ):
+            return response
+        options = self.get_options(request.path)
+        if options is None:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not response.streaming and len(response.content) < options[
+            'min_size'
+        ]:
+            return response
+        encoding, compressor = self.get_compressor(request, options)
+        if compressor is None:
+            return response
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                response.streaming_content, compressor, options['min_size']
+            )
+            del response['Content-Length']
+        else:
+            content = compressor.compress(response.content)
+            content += compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def compress_stream(chunks, compressor, flush_size):
+        """Буфер сбрасывается, когда накопилось flush_size байт входа"""
+        pending = 0
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= flush_size:
+                data += compressor.flush()
+                pending = 0
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class MetricsMiddleware:
+    """Время запроса и число запросов к базе по имени маршрута"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        start, queries = self.process_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_PROGRESS.dec()
+        self.process_response(request, response, start, queries)
+        return response
+
+    async def __acall__(self, request):
+        start, queries = self.process_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_PROGRESS.dec()
+        self.process_response(request, response, start, queries)
+        return response
+
+    @staticmethod
+    def process_request(request):
+        metrics.REQUESTS_IN_PROGRESS.inc()
+        return time.perf_counter(), metrics.start_request()
+
+    @staticmethod
+    def process_response(request, response, start, queries):
+        match = request.resolver_match
+        route = match.view_name if match else '<unmatched>'
+        metrics.REQUEST_LATENCY.labels(
+            request.method, route, response.status_code
+        ).observe(time.perf_counter() - start)
+        metrics.REQUEST_QUERIES.labels(route).observe(queries[0])
+        metrics.REQUEST_DB_TIME.labels(route).observe(queries[1])
+
+
+def is_lean_path(request):
+    return request.path_info.startswith(settings.LEAN_MIDDLEWARE_PREFIXES)
+
+
+class LeanPathBypassMixin:
+    """Middleware не работает для путей из LEAN_MIDDLEWARE_PREFIXES.
+
+    API аутентифицирует запросы токеном, поэтому сессии, CSRF и сообщения
+    нужны только админке. X-Frame-Options ставится всем ответам: он
+    стоит одного заголовка, а ответ API, открытый в браузере, тоже можно
+    встроить во фрейм.
+    """
+
+    def __call__(self, request):
+        if is_lean_path(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class LeanSessionMiddleware(LeanPathBypassMixin, SessionMiddleware):
+    pass
+
+
+class LeanCsrfViewMiddleware(LeanPathBypassMixin, CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view вызывается обработчиком в обход __call__
+        if is_lean_path(request):
+            return None
+        return super().process_view(
+            request, callback, callback_args, callback_kwargs
+        )
+
+
+class LeanAuthenticationMiddleware(
+    LeanPathBypassMixin, AuthenticationMiddleware
+):
+    pass
+
+
+class LeanMessageMiddleware(LeanPathBypassMixin, MessageMiddleware):
+    pass
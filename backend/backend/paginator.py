@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц в админке.
+
+    Для запроса без фильтров в PostgreSQL число строк берётся из
+    статистики pg_class вместо COUNT(*) по всей таблице.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return row[0]
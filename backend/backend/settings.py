@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'sorl.thumbnail',
     'rest_framework',
     'rest_framework.authtoken',
@@ -40,20 +41,59 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.BatchAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostThrottle',
+    ],
+
+    'DEFAULT_THROTTLE_RATES': {
+        'expensive': os.getenv('THROTTLE_RATE_EXPENSIVE', default='60/min'),
+    },
+
+    # Перед приложением один nginx: клиентом считается адрес, который он
+    # дописал в X-Forwarded-For, а не подставленный самим клиентом
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
 }
 
+# Сколько самых новых совпадений ?search= ранжируется и отдаётся
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', default=1000))
+
+# Стоимость ?limit= в жетонах CostThrottle
+THROTTLE_ROWS_PER_TOKEN = int(
+    os.getenv('THROTTLE_ROWS_PER_TOKEN', default=100)
+)
+
 MIDDLEWARE = [
+    'backend.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'backend.middleware.CompressionMiddleware',
+    'backend.middleware.LeanSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'backend.middleware.LeanCsrfViewMiddleware',
+    'backend.middleware.LeanAuthenticationMiddleware',
+    'backend.middleware.LeanMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.ReplicaRoutingMiddleware',
 ]
 
+# Пути, для которых Lean*Middleware пропускают сессии, CSRF и сообщения
+# (только токен-аутентификация)
+LEAN_MIDDLEWARE_PREFIXES = ('/api/',)
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -96,6 +136,47 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: DB_REPLICA_HOSTS=replica1:5432,replica2
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', default='').split(',')), 1
+):
+    host, _, port = address.strip().partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['backend.db.PrimaryReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.getenv('DB_REPLICA_STICKY_SECONDS', default=5)
+)
+DATABASE_PRIMARY_COOKIE_NAME = 'db_primary_until'
+DATABASE_HEALTH_CHECKS = False
+# Проверять перед запросом только соединения, простоявшие дольше
+DATABASE_HEALTH_CHECK_IDLE = int(
+    os.getenv('DB_HEALTH_CHECK_IDLE', default=30)
+)
+
+# При нескольких воркерах нужен общий кеш (например, memcached), иначе
+# отметки избранного в других процессах обновятся только по таймауту
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+MEMBERSHIP_CACHE_TIMEOUT = int(
+    os.getenv('MEMBERSHIP_CACHE_TIMEOUT', default=300)
+)
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -133,6 +214,31 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static/')
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media/')
 
+# Заранее сжатые снимки справочников внутри MEDIA_ROOT
+SNAPSHOTS_DIR = 'snapshots'
+SNAPSHOTS_MAX_AGE = int(os.getenv('SNAPSHOTS_MAX_AGE', default=300))
+# Сколько секунд хранить файлы замененной версии снимка
+SNAPSHOTS_KEEP_SECONDS = int(
+    os.getenv('SNAPSHOTS_KEEP_SECONDS', default=86400)
+)
+# Сгенерированные файлы для скачивания, имя - хеш содержимого
+EXPORTS_DIR = 'exports'
+# Строк на пачку при выгрузке данных пользователя
+EXPORT_BATCH_SIZE = 500
+# Потоков сборки архивов в каждом процессе
+EXPORT_THREADS = int(os.getenv('EXPORT_THREADS', default=2))
+# Повторный запрос архива моложе этого числа секунд отдаёт готовый
+EXPORT_FRESH_SECONDS = int(os.getenv('EXPORT_FRESH_SECONDS', default=300))
+# Через сколько секунд считать зависшую сборку завершённой
+EXPORT_BUILD_TIMEOUT = int(os.getenv('EXPORT_BUILD_TIMEOUT', default=600))
+
+# Файлы из MEDIA_ROOT отдаёт nginx по заголовку X-Accel-Redirect,
+# location X_ACCEL_REDIRECT_LOCATION должен быть internal
+USE_X_ACCEL_REDIRECT = os.getenv(
+    'USE_X_ACCEL_REDIRECT', default='false'
+).lower() == 'true'
+X_ACCEL_REDIRECT_LOCATION = '/protected_media/'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DJOSER = {
@@ -151,6 +257,54 @@ DJOSER = {
 
 AUTH_USER_MODEL = 'users.User'
 
+# /metrics доступен только из этих сетей и не через nginx
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    'METRICS_ALLOWED_NETWORKS',
+    default='127.0.0.0/8,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+).split(',')
+
+# Сжатие ответов: уровни для быстрого кодирования, для префиксов путей
+# можно переопределить min_size, gzip_level, brotli_quality или
+# выключить сжатие значением None
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', default=1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', default=5))
+COMPRESSION_BROTLI_QUALITY = int(
+    os.getenv('COMPRESSION_BROTLI_QUALITY', default=4)
+)
+COMPRESSION_ROUTES = {
+    '/admin/': None,
+}
+
+# Начиная с этого размера таблицы админка показывает оценку числа строк
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
 SHOPPING_LIST_FILENAME = 'shopping_list.txt'
 
 PAGE_SIZE = 6
+
+# Чтение рецептов, тегов и ингредиентов без создания экземпляров моделей
+API_FAST_READ_SERIALIZERS = os.getenv(
+    'API_FAST_READ_SERIALIZERS', default='false'
+).lower() == 'true'
+
+# Async-представления для списков и карточек рецептов, тегов и
+# ингредиентов; имеет смысл при запуске через backend.asgi
+ASYNC_READ_VIEWS = os.getenv(
+    'ASYNC_READ_VIEWS', default='false'
+).lower() == 'true'
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', default=16))
+
+BULK_RECIPES_LIMIT = 100
+
+# /api/batch/: число запросов в пакете и потоков для parallel
+BATCH_MAX_REQUESTS = 20
+BATCH_THREADS = int(os.getenv('BATCH_THREADS', default=4))
+
+# Авторы с таким числом подписчиков не рассылают рецепты по лентам,
+# их рецепты подмешиваются в ленту при чтении
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+FEED_MAX_ENTRIES = int(os.getenv('FEED_MAX_ENTRIES', default=500))
+
+# Журнал изменений для синхронизации клиентов: курсоры старше срока
+# хранения получают 410 и должны загрузить данные заново
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', default=30))
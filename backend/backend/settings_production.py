@@ -0,0 +1,34 @@
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES
+
+# Постоянные соединения: каждый поток gunicorn держит своё соединение,
+# поэтому размер пула на воркер равен GUNICORN_THREADS.
+CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', default=600))
+
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    if 'postgresql' not in database['ENGINE']:
+        continue
+    database['OPTIONS'] = {
+        'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', default=5)),
+        'keepalives': 1,
+        'keepalives_idle': int(os.getenv('DB_KEEPALIVES_IDLE', default=60)),
+    }
+
+# Воркеров gunicorn несколько: с кешем в памяти процесса отметки
+# избранного и списка покупок в других воркерах устаревали бы до
+# MEMBERSHIP_CACHE_TIMEOUT, а вёдра CostThrottle были бы у каждого свои
+if CACHES['default']['BACKEND'].endswith(('LocMemCache', 'DummyCache')):
+    raise ImproperlyConfigured(
+        'Нужен общий кеш: задайте CACHE_BACKEND и CACHE_LOCATION, '
+        'например PyMemcacheCache и memcached:11211'
+    )
+
+# Перед каждым запросом проверять, что переиспользуемое соединение живо
+DATABASE_HEALTH_CHECKS = os.getenv(
+    'DB_HEALTH_CHECKS', default='true'
+).lower() == 'true'
@@ -0,0 +1,27 @@
+"""Настройки тестов: SQLite и реплика, зеркалирующая default.
+
+Схема использует индексы и миграции PostgreSQL, поэтому тесты с базой
+(маркер postgres) выполняются, только если DB_ENGINE указывает на
+PostgreSQL; на SQLite они пропускаются.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+if os.getenv('DB_ENGINE', '').endswith('postgresql'):
+    default = {**DATABASES['default']}
+else:
+    default = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+
+DATABASES = {
+    'default': default,
+    'replica': {**default, 'TEST': {'MIRROR': 'default'}},
+}
+DATABASE_REPLICAS = ['replica']
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
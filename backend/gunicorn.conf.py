@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+import shutil
+
+# ASGI: GUNICORN_APP=backend.asgi:application
+# и GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+wsgi_app = os.getenv('GUNICORN_APP', 'backend.wsgi:application')
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# Каждый поток держит своё постоянное соединение с базой
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD_APP', 'true').lower() == 'true'
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+worker_tmp_dir = os.getenv('GUNICORN_WORKER_TMP_DIR', '/dev/shm')
+accesslog = os.getenv('GUNICORN_ACCESSLOG')
+
+# Метрики воркеров собираются через файлы в общем каталоге. Каталог
+# готовится до загрузки приложения (preload_app импортирует
+# prometheus_client в мастере); файлы прошлого запуска удаляются.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/dev/shm/prometheus')
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def post_fork(server, worker):
+    # Соединения, открытые мастером при preload_app, не должны
+    # разделяться между воркерами.
+    from django.db import connections
+    connections.close_all()
+    from backend.metrics import WORKER_THREADS
+    WORKER_THREADS.set(worker.cfg.threads)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -5,9 +5,8 @@ from .models import Ingredient
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    search_fields = ('name',)
-    list_filter = ('name',)
-    empty_value_field = '-пусто-'
+    search_fields = ('^name',)
+    empty_value_display = '-пусто-'
 
 
 admin.site.register(Ingredient, IngredientAdmin)
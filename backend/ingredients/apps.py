@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class IngredientsConfig(AppConfig):
     name = 'ingredients'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Индекс для поиска ингредиентов по началу названия (istartswith)"""
+
+    dependencies = [
+        ('ingredients', '0003_ingredient_amount'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX ingredient_name_prefix_idx '
+            'ON ingredients_ingredient (UPPER(name::text) text_pattern_ops);',
+            'DROP INDEX ingredient_name_prefix_idx;',
+        ),
+    ]
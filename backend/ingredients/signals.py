@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Ingredient
+from .snapshot import invalidate_snapshot
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_snapshot(sender, **kwargs):
+    # До фиксации параллельный запрос пересобрал бы снимок из старого
+    # каталога и записал указатель на него
+    transaction.on_commit(invalidate_snapshot)
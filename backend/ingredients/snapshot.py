@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from django.conf import settings
+
+from .models import Ingredient
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SNAPSHOT_NAME = 'ingredients'
+POINTER_NAME = f'{SNAPSHOT_NAME}.current'
+# Версия, на которую указывал сброшенный указатель
+PREVIOUS_NAME = f'{SNAPSHOT_NAME}.previous'
+ENCODINGS = {
+    'br': '.br',
+    'gzip': '.gz',
+    'identity': '',
+}
+
+
+def get_snapshot_dir():
+    return os.path.join(settings.MEDIA_ROOT, settings.SNAPSHOTS_DIR)
+
+
+def get_snapshot_path(version, encoding='identity'):
+    return os.path.join(
+        get_snapshot_dir(),
+        f'{SNAPSHOT_NAME}-{version}.json{ENCODINGS[encoding]}'
+    )
+
+
+def write_atomic(path, content):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+def build_snapshot():
+    """Записывает каталог ингредиентов в файлы с версией по содержимому.
+
+    Формат совпадает с ответом /api/ingredients/. Рядом с JSON лежат
+    заранее сжатые gzip- и, если установлен brotli, br-версии.
+    """
+    ingredients = [
+        {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+        for pk, name, measurement_unit in Ingredient.objects.order_by(
+            'name', 'id'
+        ).values_list('id', 'name', 'measurement_unit')
+    ]
+    content = json.dumps(
+        ingredients, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+    version = hashlib.sha256(content).hexdigest()[:16]
+    os.makedirs(get_snapshot_dir(), exist_ok=True)
+    if not os.path.exists(get_snapshot_path(version)):
+        if brotli is not None:
+            write_atomic(
+                get_snapshot_path(version, 'br'),
+                brotli.compress(content, quality=11)
+            )
+        write_atomic(
+            get_snapshot_path(version, 'gzip'),
+            gzip.compress(content, compresslevel=9, mtime=0)
+        )
+        write_atomic(get_snapshot_path(version), content)
+    write_atomic(
+        os.path.join(get_snapshot_dir(), POINTER_NAME), version.encode()
+    )
+    retire_previous(version)
+    remove_stale(version)
+    return version
+
+
+def get_version_files(version):
+    return [get_snapshot_path(version, encoding) for encoding in ENCODINGS]
+
+
+def retire_previous(version):
+    """Отмечает время замены предыдущей версии.
+
+    Её файлы удаляются только через SNAPSHOTS_KEEP_SECONDS: воркер,
+    уже получивший старую версию, и nginx по X-Accel-Redirect должны
+    успеть их прочитать.
+    """
+    try:
+        with open(os.path.join(get_snapshot_dir(), PREVIOUS_NAME)) as file:
+            previous = file.read().strip()
+    except FileNotFoundError:
+        return
+    if previous == version:
+        return
+    for path in get_version_files(previous):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+    try:
+        os.remove(os.path.join(get_snapshot_dir(), PREVIOUS_NAME))
+    except FileNotFoundError:
+        pass
+
+
+def remove_stale(version):
+    """Удаляет файлы других версий, замененных раньше
+    SNAPSHOTS_KEEP_SECONDS назад"""
+    prefix = f'{SNAPSHOT_NAME}-'
+    expired = time.time() - settings.SNAPSHOTS_KEEP_SECONDS
+    with os.scandir(get_snapshot_dir()) as entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix) or entry.name.startswith(
+                f'{prefix}{version}.'
+            ):
+                continue
+            try:
+                if entry.stat().st_mtime < expired:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def get_snapshot_version():
+    """Текущая версия снимка; снимок строится заново после изменений"""
+    try:
+        with open(os.path.join(get_snapshot_dir(), POINTER_NAME)) as file:
+            version = file.read().strip()
+    except FileNotFoundError:
+        return build_snapshot()
+    if not os.path.exists(get_snapshot_path(version)):
+        return build_snapshot()
+    return version
+
+
+def invalidate_snapshot():
+    """Сбрасывает указатель; версия запоминается для retire_previous"""
+    try:
+        os.replace(
+            os.path.join(get_snapshot_dir(), POINTER_NAME),
+            os.path.join(get_snapshot_dir(), PREVIOUS_NAME)
+        )
+    except FileNotFoundError:
+        pass
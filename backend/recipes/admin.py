@@ -1,47 +1,94 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from backend.paginator import EstimatedCountPaginator
+
+from .deletion import SoftDeleteAdminMixin, delete_recipes
 from .models import (Recipe,
                      RecipeIngredients,
                      RecipeTags,
                      FavoriteRecipes,
                      ShoppingList)
+from .search import update_ingredient_ids
 
 
-@admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'text', 'author', 'cooking_time', 'pub_date')
-    search_fields = ('name', 'text', 'author')
-    list_filter = ('pub_date', 'name', 'author')
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
+@admin.register(Recipe)
+class RecipeAdmin(SoftDeleteAdminMixin, LargeTableAdmin):
+    list_display = (
+        'name', 'text', 'author', 'cooking_time', 'pub_date',
+        'favorites_count'
+    )
+    list_select_related = ('author',)
+    search_fields = ('^name', '^author__username')
+    list_filter = ('pub_date', 'tags', 'is_deleted')
+    autocomplete_fields = ('author',)
+
+    def get_queryset(self, request):
+        favorites = FavoriteRecipes.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('pk')
+        ).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites), 0)
+        )
+
+    @admin.display(description='В избранном', ordering='favorites_count')
+    def favorites_count(self, obj):
+        return obj.favorites_count
+
+    def delete_queryset(self, request, queryset):
+        delete_recipes(queryset)
+
+
 @admin.register(RecipeIngredients)
-class RecipeIngredientsAdmin(admin.ModelAdmin):
+class RecipeIngredientsAdmin(LargeTableAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
-    search_fields = ('ingredient',)
-    list_filter = ('recipe', 'ingredient')
-    empty_value_display = '-пусто-'
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('^recipe__name', '^ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        update_ingredient_ids(Recipe.objects.filter(pk=obj.recipe_id))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        update_ingredient_ids(Recipe.objects.filter(pk=obj.recipe_id))
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        update_ingredient_ids(Recipe.objects.filter(pk__in=recipe_ids))
 
 
 @admin.register(RecipeTags)
-class RecipeTagsAdmin(admin.ModelAdmin):
+class RecipeTagsAdmin(LargeTableAdmin):
     list_display = ('tag', 'recipe')
-    search_fields = ('tag',)
-    list_filter = ('recipe', 'tag')
-    empty_value_display = '-пусто-'
+    list_select_related = ('tag', 'recipe')
+    search_fields = ('^recipe__name',)
+    list_filter = ('tag',)
+    autocomplete_fields = ('recipe',)
 
 
 @admin.register(FavoriteRecipes)
-class FavoriteRecipesAdmin(admin.ModelAdmin):
+class FavoriteRecipesAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-    empty_value_display = '-пусто-'
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', '^recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
+class ShoppingListAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-    empty_value_display = '-пусто-'
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', '^recipe__name')
+    autocomplete_fields = ('user', 'recipe')
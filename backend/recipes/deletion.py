@@ -0,0 +1,53 @@
+"""Мягкое удаление пользователей и рецептов.
+
+Удаление только помечает строки: пользователь сразу теряет доступ, его
+рецепты перестают отдаваться API. Зависимые строки и сами помеченные
+объекты удаляет пачками команда purge_deleted, поэтому запрос на
+удаление не загружает связанные объекты и не держит долгих блокировок.
+"""
+from django.db import transaction
+
+from api.changes import record_changes
+from api.models import Change
+from users.models import User
+
+from .models import Recipe
+
+
+@transaction.atomic
+def delete_recipes(recipes):
+    """Помечает рецепты удалёнными и пишет их удаление в журнал,
+    возвращает id помеченных"""
+    recipe_ids = list(recipes.filter(is_deleted=False).order_by(
+        'id'
+    ).values_list('id', flat=True))
+    Recipe.objects.filter(id__in=recipe_ids).update(is_deleted=True)
+    record_changes(Recipe, Change.DELETE, recipe_ids)
+    return recipe_ids
+
+
+@transaction.atomic
+def delete_users(users):
+    """Помечает пользователей удалёнными и неактивными вместе с их
+    рецептами, возвращает id рецептов"""
+    user_ids = list(users.values_list('id', flat=True))
+    User.objects.filter(id__in=user_ids).update(
+        is_deleted=True, is_active=False
+    )
+    return delete_recipes(Recipe.objects.filter(author_id__in=user_ids))
+
+
+class SoftDeleteAdminMixin:
+    """Удаление из админки через delete_queryset без сбора связанных
+    объектов для страницы подтверждения"""
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (
+            objs, {self.model._meta.verbose_name_plural: len(objs)}, set(), []
+        )
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(
+            request, self.model.objects.filter(pk=obj.pk)
+        )
@@ -0,0 +1,286 @@
+"""ZIP-архив с данными пользователя.
+
+Архив собирается потоково: ZipFile пишет в буфер, который опустошается
+после каждой пачки строк и каждого куска изображения, поэтому память
+не зависит от объёма данных. Строки читаются итераторами на курсорах
+сервера, связанные ингредиенты и теги - одним запросом на пачку.
+
+Итератор обращается к базе, поэтому его нельзя отдавать как тело
+StreamingHttpResponse: под ASGI тело читается в цикле событий. Архив
+сначала пишется в файл (write_archive), а отдаётся готовым файлом.
+Для API архив собирается в пуле потоков (start_export), запрос только
+ставит сборку в очередь.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from users.models import Follow
+
+from .models import (FavoriteRecipes, Recipe, RecipeIngredients, RecipeTags,
+                     ShoppingList)
+
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.EXPORT_THREADS, thread_name_prefix='export'
+)
+
+
+class ZipBuffer:
+    """Файл только для записи; ZipFile без seek пишет дескрипторы данных"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def write_archive(user, path, progress=None, batch_size=None):
+    """Пишет архив во временный файл и переименовывает его в path только
+    после успешной записи; возвращает размер архива"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as file:
+            for chunk in UserExport(user, progress, batch_size):
+                file.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Недописанный архив не должен остаться рядом с готовыми
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+def get_export_path(user):
+    return os.path.join(
+        settings.MEDIA_ROOT, settings.EXPORTS_DIR, f'user-{user.id}.zip'
+    )
+
+
+def get_building_key(user):
+    return f'export-building:{user.id}'
+
+
+def is_building(user):
+    return cache.get(get_building_key(user)) is not None
+
+
+def is_fresh(path):
+    """Архив собран не раньше EXPORT_FRESH_SECONDS назад"""
+    try:
+        return os.path.getmtime(path) > (
+            time.time() - settings.EXPORT_FRESH_SECONDS
+        )
+    except FileNotFoundError:
+        return False
+
+
+def start_export(user):
+    """Ставит сборку архива в очередь, если свежего архива нет и сборка
+    ещё не идёт; возвращает True, если сборка поставлена.
+
+    Отметка о сборке хранится в кеше: с общим кешем повторный запрос
+    не запустит вторую сборку и в другом воркере.
+    """
+    if is_fresh(get_export_path(user)) or not cache.add(
+        get_building_key(user), True, settings.EXPORT_BUILD_TIMEOUT
+    ):
+        return False
+    executor.submit(build_export, user)
+    return True
+
+
+def build_export(user):
+    try:
+        write_archive(user, get_export_path(user))
+    except Exception:
+        logger.exception('Не удалось собрать архив пользователя %s', user.id)
+    finally:
+        cache.delete(get_building_key(user))
+        # Соединения потока пула не закрываются по завершении запроса
+        connections.close_all()
+
+
+def get_image_name(name):
+    return f'images/{os.path.basename(name)}' if name else None
+
+
+def iter_batches(queryset, batch_size):
+    batch = []
+    for row in queryset.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class UserExport:
+    """Итератор байтов архива.
+
+    progress(section, count) вызывается после каждой пачки строк
+    и каждого изображения с числом уже записанных.
+    """
+
+    def __init__(self, user, progress=None, batch_size=None):
+        self.user = user
+        self.progress = progress or (lambda section, count: None)
+        self.batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        self.storage = Recipe._meta.get_field('image').storage
+        self.buffer = ZipBuffer()
+
+    def __iter__(self):
+        with ZipFile(self.buffer, 'w', ZIP_DEFLATED) as archive:
+            self.archive = archive
+            self.write_json('profile.json', self.get_profile())
+            yield self.buffer.pop()
+            yield from self.write_list('recipes.json', self.get_recipes())
+            yield from self.write_list(
+                'favorites.json', self.get_recipe_list(FavoriteRecipes)
+            )
+            yield from self.write_list(
+                'shopping_cart.json', self.get_recipe_list(ShoppingList)
+            )
+            yield from self.write_list(
+                'subscriptions.json', self.get_subscriptions()
+            )
+            yield from self.write_images()
+        yield self.buffer.pop()
+
+    def get_profile(self):
+        user = self.user
+        return {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'date_joined': user.date_joined,
+            'exported_at': timezone.now(),
+        }
+
+    def write_json(self, name, data):
+        with self.archive.open(name, 'w') as file:
+            file.write(orjson.dumps(data))
+
+    def write_list(self, name, batches):
+        """JSON-массив, который пишется по пачкам"""
+        count = 0
+        with self.archive.open(name, 'w') as file:
+            file.write(b'[')
+            for batch in batches:
+                for item in batch:
+                    if count:
+                        file.write(b',')
+                    file.write(orjson.dumps(item))
+                    count += 1
+                self.progress(name, count)
+                yield self.buffer.pop()
+            file.write(b']')
+        yield self.buffer.pop()
+
+    def get_recipes(self):
+        queryset = Recipe.objects.filter(
+            author=self.user, is_deleted=False
+        ).order_by('id').values(
+            'id', 'name', 'text', 'image', 'cooking_time', 'pub_date'
+        )
+        for batch in iter_batches(queryset, self.batch_size):
+            recipe_ids = [recipe['id'] for recipe in batch]
+            ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+            for row in RecipeIngredients.objects.filter(
+                recipe_id__in=recipe_ids
+            ).order_by('ingredient__name').values(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'
+            ):
+                ingredients[row['recipe_id']].append({
+                    'name': row['ingredient__name'],
+                    'measurement_unit': row['ingredient__measurement_unit'],
+                    'amount': row['amount'],
+                })
+            tags = {recipe_id: [] for recipe_id in recipe_ids}
+            for recipe_id, slug in RecipeTags.objects.filter(
+                recipe_id__in=recipe_ids
+            ).order_by('tag__slug').values_list('recipe_id', 'tag__slug'):
+                tags[recipe_id].append(slug)
+            for recipe in batch:
+                recipe['image'] = get_image_name(recipe['image'])
+                recipe['ingredients'] = ingredients[recipe['id']]
+                recipe['tags'] = tags[recipe['id']]
+            yield batch
+
+    def get_recipe_list(self, model):
+        queryset = model.objects.filter(
+            user=self.user, recipe__is_deleted=False
+        ).order_by('recipe_id').values_list('recipe_id', 'recipe__name')
+        for batch in iter_batches(queryset, self.batch_size):
+            yield [
+                {'id': recipe_id, 'name': name} for recipe_id, name in batch
+            ]
+
+    def get_subscriptions(self):
+        queryset = Follow.objects.filter(
+            user=self.user, author__is_deleted=False
+        ).order_by('author_id').values_list('author_id', 'author__username')
+        for batch in iter_batches(queryset, self.batch_size):
+            yield [
+                {'id': author_id, 'username': username}
+                for author_id, username in batch
+            ]
+
+    def write_images(self):
+        names = Recipe.objects.filter(
+            author=self.user, is_deleted=False
+        ).exclude(
+            image=''
+        ).order_by('image').values_list('image', flat=True).distinct()
+        for count, name in enumerate(
+            names.iterator(chunk_size=self.batch_size), 1
+        ):
+            yield from self.write_image(name)
+            self.progress('images', count)
+
+    def write_image(self, name):
+        """Изображение без сжатия: JPEG и PNG уже сжаты"""
+        try:
+            source = self.storage.open(name, 'rb')
+        except FileNotFoundError:
+            return
+        info = ZipInfo(get_image_name(name), timezone.now().timetuple()[:6])
+        info.compress_type = ZIP_STORED
+        info.file_size = self.storage.size(name)
+        with source, self.archive.open(info, 'w') as file:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                file.write(chunk)
+                yield self.buffer.pop()
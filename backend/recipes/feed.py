@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Follow, User
+
+from .models import FeedEntry, Recipe
+
+
+def followers_count(author_id):
+    return User.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def change_followers_count(author_ids, delta):
+    """Вызывается в транзакции, которая создала или удалила подписки,
+    по одной на каждого автора"""
+    User.objects.filter(pk__in=author_ids).update(
+        followers_count=F('followers_count') + delta
+    )
+
+
+def recount_followers(author_ids):
+    """Пересчитывает followers_count по таблице подписок"""
+    followers = Follow.objects.filter(
+        author=OuterRef('pk')
+    ).order_by().values('author').annotate(count=Count('pk')).values('count')
+    User.objects.filter(pk__in=author_ids).update(
+        followers_count=Coalesce(Subquery(followers), 0)
+    )
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора.
+
+    Рецепты популярных авторов в ленты не пишутся: они подмешиваются
+    при чтении, см. get_feed_page.
+    """
+    if followers_count(recipe.author_id) >= settings.FEED_FANOUT_LIMIT:
+        return
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+         for user_id in followers.iterator()],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту последние рецепты нового автора в подписках"""
+    if followers_count(author.id) >= settings.FEED_FANOUT_LIMIT:
+        return
+    recipes = Recipe.objects.filter(
+        author=author, is_deleted=False
+    ).order_by('-pub_date').values_list('id', 'pub_date')[:settings.FEED_MAX_ENTRIES]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user=user, recipe_id=recipe_id, pub_date=pub_date)
+         for recipe_id, pub_date in recipes],
+        ignore_conflicts=True
+    )
+
+
+def remove_author(user, author):
+    FeedEntry.objects.filter(user=user, recipe__author=author).delete()
+
+
+def popular_authors(user):
+    """Авторы из подписок, чьи рецепты подмешиваются при чтении"""
+    return list(Follow.objects.filter(
+        user=user, author__followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+
+
+def before(position, recipe_field):
+    if position is None:
+        return Q()
+    pub_date, recipe_id = position
+    return Q(pub_date__lt=pub_date) | Q(
+        pub_date=pub_date, **{f'{recipe_field}__lt': recipe_id}
+    )
+
+
+def get_feed_page(user, position, limit):
+    """Страница ленты после позиции (pub_date, recipe_id).
+
+    Возвращает позиции рецептов от новых к старым и признак наличия
+    следующей страницы.
+    """
+    entries = set(FeedEntry.objects.filter(
+        before(position, 'recipe_id'), user=user, recipe__is_deleted=False
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit + 1])
+    authors = popular_authors(user)
+    if authors:
+        entries.update(Recipe.objects.filter(
+            before(position, 'id'), author_id__in=authors, is_deleted=False
+        ).order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:limit + 1])
+    entries = sorted(entries, reverse=True)
+    return entries[:limit], len(entries) > limit
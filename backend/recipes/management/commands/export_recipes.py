@@ -0,0 +1,74 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import Recipe, RecipeIngredients
+
+
+def recipe_to_dict(recipe):
+    return {
+        'id': recipe.id,
+        'author': recipe.author.username,
+        'name': recipe.name,
+        'text': recipe.text,
+        'image': recipe.image.name,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'ingredients': [
+            {
+                'name': amount.ingredient.name,
+                'measurement_unit': amount.ingredient.measurement_unit,
+                'amount': amount.amount,
+            }
+            for amount in recipe.recipe_amount.all()
+        ],
+        'tags': [tag.slug for tag in recipe.tags.all()],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты с ингредиентами и тегами в JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            self.export(sys.stdout, options['batch_size'])
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            count = self.export(output, options['batch_size'])
+        self.stderr.write(f'Выгружено рецептов: {count}')
+
+    @staticmethod
+    def export(output, batch_size):
+        """Читает рецепты пачками по id, не держа всю таблицу в памяти"""
+        queryset = Recipe.objects.filter(
+            is_deleted=False
+        ).select_related('author').prefetch_related(
+            Prefetch(
+                'recipe_amount',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredient'
+                )
+            ),
+            'tags',
+        ).order_by('id')
+        last_id, count = 0, 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return count
+            for recipe in batch:
+                output.write(
+                    json.dumps(recipe_to_dict(recipe), ensure_ascii=False)
+                )
+                output.write('\n')
+            last_id = batch[-1].id
+            count += len(batch)
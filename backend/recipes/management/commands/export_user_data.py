@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.export import write_archive
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает данные пользователя в ZIP-архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            'output', nargs='?',
+            help='Файл архива, по умолчанию foodgram-<username>.zip'
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        output = options['output'] or f'foodgram-{user.username}.zip'
+        size = write_archive(
+            user, output, self.report, options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Архив {output}: {size} байт'
+        ))
+
+    def report(self, section, count):
+        self.stdout.write(f'{section}: {count}')
@@ -0,0 +1,121 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет изображения рецептов, на которые не ссылается ни один '
+        'рецепт, и старые сгенерированные файлы из EXPORTS_DIR'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=86400,
+            help='Не трогать файлы моложе стольких секунд'
+        )
+        parser.add_argument(
+            '--exports-max-age',
+            type=int,
+            default=3600,
+            help='Удалять файлы EXPORTS_DIR, не использованные столько секунд'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько имён проверять одним запросом'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что было бы удалено'
+        )
+
+    def walk(self, storage, directory, max_mtime):
+        """Имена файлов относительно MEDIA_ROOT без загрузки списка в память"""
+        stack = [directory]
+        while stack:
+            with os.scandir(storage.path(stack.pop())) as entries:
+                for entry in entries:
+                    relative = os.path.relpath(entry.path, storage.location)
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(relative)
+                    elif (
+                        entry.is_file(follow_symlinks=False)
+                        and entry.stat().st_mtime < max_mtime
+                    ):
+                        yield relative.replace(os.sep, '/'), entry.stat()
+
+    def collect(self, storage, batch):
+        referenced = set(Recipe.objects.filter(
+            image__in=batch
+        ).values_list('image', flat=True))
+        removed = freed = 0
+        for name, stat in batch.items():
+            if name in referenced:
+                continue
+            if self.options['dry_run']:
+                self.stdout.write(name)
+            else:
+                try:
+                    os.remove(storage.path(name))
+                except FileNotFoundError:
+                    continue
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
+
+    def sweep_exports(self, storage):
+        """Файлы отдаются сразу после записи, а при повторном
+        использовании write_export обновляет их mtime"""
+        if not storage.exists(settings.EXPORTS_DIR):
+            return 0, 0
+        max_mtime = time.time() - self.options['exports_max_age']
+        removed = freed = 0
+        for name, stat in self.walk(
+            storage, settings.EXPORTS_DIR, max_mtime
+        ):
+            if self.options['dry_run']:
+                self.stdout.write(name)
+            else:
+                try:
+                    os.remove(storage.path(name))
+                except FileNotFoundError:
+                    continue
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
+
+    def handle(self, *args, **options):
+        self.options = options
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        removed, freed = self.sweep_exports(storage)
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов выгрузок: {removed}, {freed // 1024} КБ'
+        ))
+        if not storage.exists(field.upload_to):
+            return
+        max_mtime = time.time() - options['min_age']
+        removed = freed = 0
+        batch = {}
+        for name, stat in self.walk(storage, field.upload_to, max_mtime):
+            batch[name] = stat
+            if len(batch) >= options['batch_size']:
+                counts = self.collect(storage, batch)
+                removed, freed = removed + counts[0], freed + counts[1]
+                batch = {}
+        if batch:
+            counts = self.collect(storage, batch)
+            removed, freed = removed + counts[0], freed + counts[1]
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {freed // 1024} КБ'
+        ))
@@ -0,0 +1,161 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from api.changes import record_changes
+from api.models import Change
+from ingredients.models import Ingredient
+from ingredients.snapshot import invalidate_snapshot
+from recipes.models import Recipe, RecipeIngredients, RecipeTags
+from recipes.search import update_ingredient_ids, update_search_vector
+from tags.models import Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Загружает рецепты из JSONL, созданного export_recipes. '
+            'Ингредиенты сопоставляются по названию и единице измерения, '
+            'теги - по слагу, авторы - по username.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл JSONL')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <input>.checkpoint'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с последней контрольной точки'
+        )
+
+    def handle(self, *args, **options):
+        self.checkpoint = (
+            options['checkpoint'] or f'{options["input"]}.checkpoint'
+        )
+        start = self.read_checkpoint() if options['resume'] else 0
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.imported, self.skipped = 0, 0
+        batch, line_number = [], start
+        with open(options['input'], encoding='utf-8') as source:
+            for line_number, line in enumerate(source, 1):
+                if line_number <= start or not line.strip():
+                    continue
+                batch.append(json.loads(line))
+                if len(batch) >= options['batch_size']:
+                    self.import_batch(batch)
+                    self.write_checkpoint(line_number)
+                    batch = []
+        if batch:
+            self.import_batch(batch)
+            self.write_checkpoint(line_number)
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {self.imported}, '
+            f'пропущено: {self.skipped}'
+        ))
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint) as checkpoint:
+                return int(checkpoint.read())
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            raise CommandError(f'Повреждён файл {self.checkpoint}')
+
+    def write_checkpoint(self, line_number):
+        with open(f'{self.checkpoint}.tmp', 'w') as checkpoint:
+            checkpoint.write(str(line_number))
+        os.replace(f'{self.checkpoint}.tmp', self.checkpoint)
+        self.stdout.write(f'Обработано строк: {line_number}')
+
+    def resolve_ingredients(self, records):
+        missing = {
+            (item['name'], item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        } - self.ingredients.keys()
+        if not missing:
+            return
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in missing],
+            ignore_conflicts=True
+        )
+        # bulk_create не отправляет post_save, снимок сбрасывается вручную
+        transaction.on_commit(invalidate_snapshot)
+        self.ingredients.update({
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.filter(
+                name__in={name for name, _ in missing}
+            ).values_list('id', 'name', 'measurement_unit')
+        })
+
+    @transaction.atomic
+    def import_batch(self, records):
+        existing = set(Recipe.objects.filter(
+            name__in=[record['name'] for record in records], is_deleted=False
+        ).values_list('name', flat=True))
+        authors = dict(User.objects.filter(
+            username__in={record['author'] for record in records}
+        ).values_list('username', 'id'))
+        tags = dict(Tag.objects.filter(
+            slug__in={slug for record in records for slug in record['tags']}
+        ).values_list('slug', 'id'))
+        kept = []
+        for record in records:
+            if record['name'] in existing or record['author'] not in authors:
+                continue
+            existing.add(record['name'])
+            kept.append(record)
+        self.skipped += len(records) - len(kept)
+        records = kept
+        if not records:
+            return
+        self.resolve_ingredients(records)
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author_id=authors[record['author']],
+                name=record['name'],
+                text=record['text'],
+                image=record['image'],
+                cooking_time=record['cooking_time'],
+            )
+            for record in records
+        ])
+        # auto_now_add перезаписывает дату при вставке, восстанавливаем её
+        for recipe, record in zip(recipes, records):
+            recipe.pub_date = parse_datetime(record['pub_date'])
+        recipe_ids = dict(Recipe.objects.filter(
+            name__in=[record['name'] for record in records], is_deleted=False
+        ).values_list('name', 'id'))
+        for recipe in recipes:
+            recipe.pk = recipe_ids[recipe.name]
+        Recipe.objects.bulk_update(recipes, ['pub_date'])
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(
+                recipe_id=recipe_ids[record['name']],
+                ingredient_id=self.ingredients[
+                    (item['name'], item['measurement_unit'])
+                ],
+                amount=item['amount'],
+            )
+            for record in records for item in record['ingredients']
+        ])
+        RecipeTags.objects.bulk_create([
+            RecipeTags(recipe_id=recipe_ids[record['name']], tag_id=tags[slug])
+            for record in records for slug in record['tags'] if slug in tags
+        ])
+        imported = Recipe.objects.filter(id__in=recipe_ids.values())
+        update_search_vector(imported)
+        update_ingredient_ids(imported)
+        # Клиенты синхронизации узнают о новых рецептах из журнала
+        record_changes(Recipe, Change.UPSERT, list(recipe_ids.values()))
+        self.imported += len(records)
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Оставляет в лентах подписок не больше FEED_MAX_ENTRIES записей'
+
+    def handle(self, *args, **options):
+        limit = settings.FEED_MAX_ENTRIES
+        users = FeedEntry.objects.order_by().values('user').annotate(
+            entries=Count('pk')
+        ).filter(entries__gt=limit).values_list('user', flat=True)
+        trimmed = 0
+        for user_id in users.iterator():
+            pub_date, recipe_id = FeedEntry.objects.filter(
+                user_id=user_id
+            ).order_by('-pub_date', '-recipe_id').values_list(
+                'pub_date', 'recipe_id'
+            )[limit]
+            deleted, _ = FeedEntry.objects.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, recipe_id__lte=recipe_id),
+                user_id=user_id
+            ).delete()
+            trimmed += deleted
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {trimmed}'))
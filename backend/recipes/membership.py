@@ -0,0 +1,105 @@
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.metrics import record_cache
+
+from .models import FavoriteRecipes, ShoppingList
+
+KEYS = {
+    FavoriteRecipes: 'favorites',
+    ShoppingList: 'shopping_cart',
+}
+
+
+class RecipeIdSet:
+    """Отсортированный массив id рецептов с проверкой вхождения бинарным
+    поиском; в кеше хранится как байты массива (8 байт на рецепт)"""
+
+    def __init__(self, ids=()):
+        self.ids = ids if isinstance(ids, array) else array('q', ids)
+
+    @classmethod
+    def from_bytes(cls, data):
+        ids = array('q')
+        ids.frombytes(data)
+        return cls(ids)
+
+    def to_bytes(self):
+        return self.ids.tobytes()
+
+    def __contains__(self, recipe_id):
+        index = bisect_left(self.ids, recipe_id)
+        return index < len(self.ids) and self.ids[index] == recipe_id
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def get_cache_key(model, user_id):
+    return f'membership:{KEYS[model]}:{user_id}'
+
+
+def get_version_key(model, user_id):
+    return f'membership:{KEYS[model]}:{user_id}:version'
+
+
+def get_version(version_key):
+    """Версия списка; потерянный ключ получает новое случайное
+    значение, чтобы не совпасть с версией в уже сохранённом множестве"""
+    cache.add(version_key, time.time_ns(), None)
+    return cache.get(version_key)
+
+
+def get_membership(model, user):
+    """Рецепты пользователя в избранном или списке покупок.
+
+    Множество хранится вместе с версией списка, прочитанной до запроса
+    к базе. Изменение списка увеличивает версию, поэтому множество,
+    собранное параллельным запросом до фиксации изменения, в кеш
+    попадает, но больше не используется. Чтение всегда с основной базы:
+    отставание реплики сохранилось бы в кеше на весь таймаут.
+    """
+    if not user.is_authenticated:
+        return RecipeIdSet()
+    key = get_cache_key(model, user.id)
+    version_key = get_version_key(model, user.id)
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key)
+    if version is None:
+        version = get_version(version_key)
+    data = cached.get(key)
+    hit = data is not None and data[0] == version
+    record_cache('membership', hit)
+    if hit:
+        return RecipeIdSet.from_bytes(data[1])
+    membership = RecipeIdSet(model.objects.using('default').filter(
+        user=user
+    ).order_by('recipe_id').values_list('recipe_id', flat=True))
+    cache.set(
+        key,
+        (version, membership.to_bytes()),
+        settings.MEMBERSHIP_CACHE_TIMEOUT
+    )
+    return membership
+
+
+def invalidate_membership(model, user):
+    """Меняет версию списка после фиксации транзакции с изменением"""
+    version_key = get_version_key(model, user.id)
+
+    def bump():
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            # Версии нет: её заново создаст следующее чтение
+            pass
+
+    transaction.on_commit(bump)
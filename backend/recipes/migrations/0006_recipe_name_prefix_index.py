@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Индекс для поиска рецептов по началу названия в админке"""
+
+    dependencies = [
+        ('recipes', '0005_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipe_name_prefix_idx '
+            'ON recipes_recipe (UPPER(name::text) text_pattern_ops);',
+            'DROP INDEX recipe_name_prefix_idx;',
+        ),
+    ]
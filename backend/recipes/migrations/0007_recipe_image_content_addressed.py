@@ -0,0 +1,19 @@
+# Generated by Django 3.2.15 on 2026-10-19 12:06
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_name_prefix_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='Изображение', storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/', verbose_name='Изображение'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.15 on 2026-10-19 12:09
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, help_text='Отсортированные id ингредиентов для поиска по продуктам', size=None, verbose_name='Id ингредиентов'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='recipe_ingredient_ids_idx'),
+        ),
+        migrations.RunSQL(
+            'UPDATE recipes_recipe SET ingredient_ids = COALESCE(('
+            'SELECT array_agg(DISTINCT ingredient_id ORDER BY ingredient_id) '
+            'FROM recipes_recipeingredients '
+            'WHERE recipe_id = recipes_recipe.id'
+            "), '{}');",
+            migrations.RunSQL.noop,
+        ),
+    ]
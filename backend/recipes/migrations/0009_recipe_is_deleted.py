@@ -0,0 +1,22 @@
+# Generated by Django 3.2.15 on 2026-10-19 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_ingredient_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, help_text='Скрыт из API, удаляется командой purge_deleted', verbose_name='Удалён'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['id'], name='recipe_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.15 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_is_deleted'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='recipe',
+            name='unique_name_author',
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(help_text='Название', max_length=200, verbose_name='Название'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('name',), name='unique_recipe_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('name', 'author'), name='unique_name_author'),
+        ),
+    ]
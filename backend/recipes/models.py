@@ -1,3 +1,6 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models.constraints import UniqueConstraint
@@ -6,11 +9,12 @@ from ingredients.models import Ingredient
 from tags.models import Tag
 from users.models import User
 
+from .storage import ContentAddressedStorage
+
 
 class Recipe(models.Model):
     name = models.CharField(
         max_length=200,
-        unique=True,
         verbose_name='Название',
         help_text='Название'
     )
@@ -27,6 +31,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/',
+        storage=ContentAddressedStorage(),
         verbose_name='Изображение',
         help_text='Изображение'
     )
@@ -54,12 +59,64 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         help_text='Дата публикации'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    ingredient_ids = ArrayField(
+        models.IntegerField(),
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name='Id ингредиентов',
+        help_text='Отсортированные id ингредиентов для поиска по продуктам'
+    )
+    is_deleted = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Удалён',
+        help_text='Скрыт из API, удаляется командой purge_deleted'
+    )
 
     class Meta:
-        constraints = [UniqueConstraint(
-            fields=('name', 'author'),
-            name='unique_name_author'
-        )]
+        # Название скрытого рецепта освобождается сразу, не дожидаясь
+        # purge_deleted
+        constraints = [
+            UniqueConstraint(
+                fields=('name',),
+                condition=models.Q(is_deleted=False),
+                name='unique_recipe_name'
+            ),
+            UniqueConstraint(
+                fields=('name', 'author'),
+                condition=models.Q(is_deleted=False),
+                name='unique_name_author'
+            ),
+        ]
+        indexes = [
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx'
+            ),
+            GinIndex(
+                fields=('ingredient_ids',),
+                name='recipe_ingredient_ids_idx'
+            ),
+            models.Index(
+                fields=('pub_date',),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('id',),
+                condition=models.Q(is_deleted=True),
+                name='recipe_deleted_idx'
+            ),
+        ]
         ordering = ('pub_date',)
         verbose_name = 'Рецепт',
         verbose_name_plural = 'Рецепты'
@@ -97,6 +154,10 @@ class RecipeIngredients(models.Model):
             fields=('recipe', 'ingredient'),
             name='unique_ingredient'
         )]
+        indexes = [models.Index(
+            fields=('ingredient', 'recipe'),
+            name='recipe_ingredient_reverse_idx'
+        )]
         ordering = ('ingredient',)
         verbose_name = 'Количество ингредиентов в рецепте'
         verbose_name_plural = 'Количество ингредиентов в рецепте'
@@ -126,6 +187,10 @@ class RecipeTags(models.Model):
             fields=('recipe', 'tag'),
             name='unique_tag'
         )]
+        indexes = [models.Index(
+            fields=('tag', 'recipe'),
+            name='recipe_tag_reverse_idx'
+        )]
         ordering = ('tag',)
         verbose_name = 'Тег рецепта'
         verbose_name_plural = 'Теги рецепта'
@@ -155,6 +220,10 @@ class FavoriteRecipes(models.Model):
             fields=('user', 'recipe'),
             name='unique_favorite_recipes'
         )]
+        indexes = [models.Index(
+            fields=('recipe', 'user'),
+            name='favorite_recipe_user_idx'
+        )]
         ordering = ('recipe',)
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
@@ -184,8 +253,49 @@ class ShoppingList(models.Model):
             fields=('user', 'recipe'),
             name='unique_shoppinglist_recipe'
         )]
+        indexes = [models.Index(
+            fields=('recipe', 'user'),
+            name='shoppinglist_recipe_user_idx'
+        )]
         verbose_name = 'Список покупок',
         verbose_name_plural = 'Списки покупок'
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+        help_text='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+        help_text='Рецепт'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+        help_text='Дата публикации рецепта'
+    )
+
+    class Meta:
+        constraints = [UniqueConstraint(
+            fields=('user', 'recipe'),
+            name='unique_feed_entry'
+        )]
+        indexes = [models.Index(
+            fields=('user', '-pub_date', '-recipe'),
+            name='feed_user_pub_date_idx'
+        )]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return f'{self.recipe} в ленте у {self.user}'
@@ -0,0 +1,40 @@
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVector
+from django.db.models import IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import RecipeIngredients
+
+SEARCH_CONFIG = 'russian'
+
+
+def build_search_vector():
+    """Название весит больше описания при ранжировании"""
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(queryset):
+    """Пересчитывает поисковый вектор одним UPDATE"""
+    return queryset.update(search_vector=build_search_vector())
+
+
+def build_ingredient_ids():
+    """Отсортированный массив id ингредиентов рецепта"""
+    ingredient_ids = RecipeIngredients.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        ids=ArrayAgg('ingredient_id', distinct=True, ordering='ingredient_id')
+    ).values('ids')
+    return Coalesce(
+        Subquery(ingredient_ids),
+        Value([], output_field=ArrayField(IntegerField()))
+    )
+
+
+def update_ingredient_ids(queryset):
+    """Пересчитывает индекс ингредиентов одним UPDATE"""
+    return queryset.update(ingredient_ids=build_ingredient_ids())
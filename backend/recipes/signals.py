@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Recipe
+from .search import update_search_vector
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_vector(sender, instance, created, update_fields, **kwargs):
+    if update_fields is not None and not {'name', 'text'} & set(update_fields):
+        return
+    update_search_vector(Recipe.objects.filter(pk=instance.pk))
@@ -0,0 +1,34 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы называются по sha256 содержимого.
+
+    Повторная загрузка того же изображения не создаёт новый файл, а
+    возвращает имя уже сохранённого. Файлы раскладываются по подкаталогам
+    из первых двух символов хеша. Неиспользуемые файлы удаляет команда
+    gc_media.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, digest[:2], f'{digest}{extension}')
+        if self.exists(name):
+            # Свежая отметка времени защищает файл от gc_media, пока
+            # ссылающаяся на него запись ещё не зафиксирована
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
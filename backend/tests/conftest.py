@@ -0,0 +1,17 @@
+import pytest
+from django.conf import settings
+
+
+def pytest_collection_modifyitems(config, items):
+    if settings.DATABASES['default']['ENGINE'].endswith('postgresql'):
+        return
+    skip = pytest.mark.skip(reason='нужен PostgreSQL: задайте DB_ENGINE')
+    for item in items:
+        if 'postgres' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
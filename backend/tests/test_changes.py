@@ -0,0 +1,76 @@
+import json
+import threading
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from api.changes import record_changes
+from api.models import Change
+from recipes.models import Recipe
+from users.models import User
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.django_db(transaction=True, databases='__all__'),
+]
+
+
+def poll(client, cursor):
+    """Все доступные изменения после курсора и новый курсор"""
+    object_ids = []
+    while True:
+        data = client.get('/api/changes/', {'since': cursor}).json()
+        object_ids += [change['object_id'] for change in data['results']]
+        cursor = data['next_cursor']
+        if not data['has_more']:
+            return object_ids, cursor
+
+
+def test_long_transaction_is_not_skipped(client):
+    cursor = client.get('/api/changes/').json()['next_cursor']
+    recorded, release = threading.Event(), threading.Event()
+
+    def long_transaction():
+        try:
+            with transaction.atomic():
+                record_changes(Recipe, Change.UPSERT, [1])
+                recorded.set()
+                release.wait(10)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=long_transaction)
+    thread.start()
+    recorded.wait(10)
+    # Более поздняя транзакция фиксируется раньше долгой
+    record_changes(Recipe, Change.UPSERT, [2])
+    seen, cursor = poll(client, cursor)
+    release.set()
+    thread.join()
+    later, cursor = poll(client, cursor)
+    assert 1 not in seen
+    assert sorted(seen + later) == [1, 2]
+
+
+def test_import_is_journaled(client, tmp_path):
+    cursor = client.get('/api/changes/').json()['next_cursor']
+    User.objects.create_user(
+        username='cook', email='cook@example.com', password='secret-pass'
+    )
+    source = tmp_path / 'recipes.jsonl'
+    source.write_text(json.dumps({
+        'author': 'cook',
+        'name': 'щи',
+        'text': 'щи',
+        'image': '',
+        'cooking_time': 60,
+        'pub_date': '2024-01-01T00:00:00+00:00',
+        'ingredients': [
+            {'name': 'капуста', 'measurement_unit': 'г', 'amount': 300}
+        ],
+        'tags': [],
+    }, ensure_ascii=False) + '\n', encoding='utf-8')
+    call_command('import_recipes', str(source))
+    seen, _ = poll(client, cursor)
+    assert seen == [Recipe.objects.get(name='щи').id]
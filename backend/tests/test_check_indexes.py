@@ -0,0 +1,36 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Recipe
+from tags.models import Tag
+from users.models import User
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db
+def test_check_indexes_uses_api_filters():
+    author = User.objects.create_user(
+        username='cook', email='cook@example.com', password='secret-pass'
+    )
+    Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+    Recipe.objects.create(
+        author=author, name='суп', text='суп', cooking_time=10,
+        ingredient_ids=[1]
+    )
+    output = StringIO()
+    call_command('check_indexes', verbosity=2, stdout=output)
+    plans = output.getvalue()
+    assert 'recipes-list?search: OK' in plans
+    # Запросы строит RecipeViewSet: удалённые рецепты скрыты
+    assert 'is_deleted' in plans
+    assert 'search_vector @@' in plans
+
+
+def test_check_indexes_skips_other_databases(settings):
+    if settings.DATABASES['default']['ENGINE'].endswith('postgresql'):
+        pytest.skip('проверяется на SQLite')
+    output = StringIO()
+    call_command('check_indexes', stdout=output)
+    assert 'только для PostgreSQL' in output.getvalue()
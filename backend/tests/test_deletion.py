@@ -0,0 +1,68 @@
+import pytest
+from django.contrib import admin
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+
+from api.models import Change
+from recipes.models import Recipe
+from users.models import User
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.django_db(transaction=True, databases='__all__'),
+]
+
+
+@pytest.fixture
+def recipes():
+    author = User.objects.create_user(
+        username='cook', email='cook@example.com', password='secret-pass'
+    )
+    return [
+        Recipe.objects.create(
+            author=author, name=f'суп {n}', text='суп', cooking_time=10
+        ) for n in range(2)
+    ]
+
+
+def deleted_ids():
+    return sorted(Change.objects.filter(
+        entity=Change.RECIPE, action=Change.DELETE
+    ).values_list('object_id', flat=True))
+
+
+def test_admin_recipe_delete_is_journaled(recipes):
+    admin.site._registry[Recipe].delete_queryset(
+        None, Recipe.objects.filter(id__in=[recipe.id for recipe in recipes])
+    )
+    assert deleted_ids() == [recipe.id for recipe in recipes]
+
+
+def test_admin_user_delete_is_journaled(recipes):
+    admin.site._registry[User].delete_model(None, recipes[0].author)
+    assert deleted_ids() == [recipe.id for recipe in recipes]
+
+
+def test_purge_is_journaled(recipes):
+    # Пометка в обход deletion не попадает в журнал
+    Recipe.objects.filter(id=recipes[0].id).update(is_deleted=True)
+    call_command('purge_deleted')
+    assert deleted_ids() == [recipes[0].id]
+    assert not Recipe.objects.filter(id=recipes[0].id).exists()
+
+
+def test_delete_me_keeps_profile_contract(client, recipes):
+    author = recipes[0].author
+    token = Token.objects.create(user=author)
+    # Тело проверяется сериализатором профиля, current_password не нужен
+    response = client.delete(
+        '/api/users/me/',
+        {
+            'username': author.username, 'email': author.email,
+            'first_name': 'Иван', 'last_name': 'Петров',
+        },
+        content_type='application/json',
+        HTTP_AUTHORIZATION=f'Token {token.key}'
+    )
+    assert response.status_code == 204
+    assert User.objects.get(id=author.id).is_deleted
@@ -0,0 +1,76 @@
+import io
+import os
+import time
+from zipfile import ZipFile
+
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+
+from recipes.export import get_export_path
+from users.models import User
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.django_db(transaction=True, databases='__all__'),
+]
+
+URL = '/api/users/me/export/'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # В кеше ведро ограничителя частоты и отметка о сборке
+    cache.clear()
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(
+        username='cook', email='cook@example.com', password='secret-pass'
+    )
+
+
+@pytest.fixture
+def auth(user):
+    return {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=user)}'}
+
+
+def wait_ready(client, auth):
+    for _ in range(100):
+        response = client.get(URL, **auth)
+        if response.status_code != 202:
+            return response
+        time.sleep(0.05)
+    raise AssertionError('архив не собран')
+
+
+def test_get_does_not_build(client, auth, user):
+    assert client.get(URL, **auth).status_code == 404
+    assert not os.path.exists(get_export_path(user))
+
+
+def test_post_builds_and_get_serves(client, auth):
+    assert client.post(URL, **auth).status_code == 202
+    response = wait_ready(client, auth)
+    assert response.status_code == 200
+    archive = ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+    assert 'profile.json' in archive.namelist()
+
+
+def test_fresh_archive_is_reused(client, auth, user):
+    client.post(URL, **auth)
+    wait_ready(client, auth)
+    path = get_export_path(user)
+    built = os.path.getmtime(path)
+    response = client.post(URL, **auth)
+    assert response.status_code == 200
+    assert response.json() == {'status': 'ready'}
+    assert os.path.getmtime(path) == built
+
+    # Устаревший архив собирается заново
+    os.utime(path, (0, 0))
+    cache.clear()
+    assert client.post(URL, **auth).status_code == 202
+    wait_ready(client, auth)
+    assert os.path.getmtime(path) > 0
@@ -0,0 +1,72 @@
+import pytest
+
+from recipes.models import Recipe
+from recipes.search import update_search_vector
+from users.models import User
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.django_db(transaction=True, databases='__all__'),
+]
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(
+        username='cook', email='cook@example.com', password='secret-pass'
+    )
+
+
+def create_recipe(author, name, text, ingredient_ids):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text=text, cooking_time=10,
+        ingredient_ids=ingredient_ids
+    )
+    update_search_vector(Recipe.objects.filter(pk=recipe.pk))
+    return recipe
+
+
+def list_ids(client, **params):
+    response = client.get('/api/recipes/', params)
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.parametrize(
+    'param', ('ingredients', 'exclude_ingredients', 'have')
+)
+def test_fractional_ingredient_id_is_rejected(client, param):
+    response = client.get('/api/recipes/', {param: '1.9'})
+    assert response.status_code == 400
+    assert param in response.json()
+
+
+def test_have_orders_before_search_rank(client, author):
+    # Суп чаще в описании, но из имеющихся ингредиентов только половина
+    half = create_recipe(author, 'суп', 'суп суп суп', [1, 2])
+    full = create_recipe(author, 'обед', 'суп', [1])
+    assert list_ids(client, search='суп') == [half.id, full.id]
+    assert list_ids(client, search='суп', have='1') == [full.id, half.id]
+
+
+def test_search_rank_breaks_have_ties(client, author):
+    low = create_recipe(author, 'обед', 'суп', [1])
+    high = create_recipe(author, 'суп', 'суп суп', [1])
+    assert list_ids(client, search='суп', have='1') == [high.id, low.id]
+
+
+def test_search_limits_the_best_ranked(client, author, settings):
+    settings.SEARCH_MAX_RESULTS = 1
+    best = create_recipe(author, 'суп', 'суп суп', [1])
+    # Новее, но ниже по рангу
+    create_recipe(author, 'обед', 'суп', [1])
+    assert list_ids(client, search='суп') == [best.id]
+
+
+@pytest.mark.parametrize('fast', (False, True))
+def test_search_highlights_name(client, author, settings, fast):
+    settings.API_FAST_READ_SERIALIZERS = fast
+    create_recipe(author, 'Грибной суп', 'Варить суп час', [1])
+    recipe, = client.get('/api/recipes/', {'search': 'суп'}).json()['results']
+    assert recipe['name_headline'] == 'Грибной <mark>суп</mark>'
+    assert '<mark>суп</mark>' in recipe['search_headline']
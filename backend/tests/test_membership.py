@@ -0,0 +1,20 @@
+from recipes.membership import RecipeIdSet
+
+
+def test_contains():
+    ids = RecipeIdSet([2, 5, 9])
+    assert [n in ids for n in range(11)] == [
+        n in (2, 5, 9) for n in range(11)
+    ]
+    assert 1 not in RecipeIdSet()
+
+
+def test_bytes_round_trip():
+    ids = RecipeIdSet([1, 2 ** 40, 2 ** 62])
+    data = ids.to_bytes()
+    # 8 байт на рецепт
+    assert len(data) == 24
+    restored = RecipeIdSet.from_bytes(data)
+    assert list(restored) == [1, 2 ** 40, 2 ** 62]
+    assert 2 ** 40 in restored
+    assert len(RecipeIdSet.from_bytes(RecipeIdSet().to_bytes())) == 0
@@ -0,0 +1,92 @@
+import gzip
+
+import brotli
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+
+from backend.middleware import CompressionMiddleware
+
+factory = RequestFactory()
+
+
+@override_settings(X_FRAME_OPTIONS='DENY')
+def test_api_keeps_x_frame_options(client):
+    response = client.get('/api/unknown/')
+    assert response['X-Frame-Options'] == 'DENY'
+    # Сессии для API по-прежнему не читаются и не ставятся
+    assert 'sessionid' not in response.cookies
+
+
+def compress(request, response):
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+def json_response(size=4096):
+    response = HttpResponse(
+        b'{"name": "' + b'a' * size + b'"}', content_type='application/json'
+    )
+    response['ETag'] = '"v1"'
+    return response
+
+
+def test_brotli_preferred():
+    response = compress(
+        factory.get('/api/recipes/', HTTP_ACCEPT_ENCODING='gzip, br'),
+        json_response()
+    )
+    assert response['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.content).startswith(b'{"name": "a')
+    assert response['Content-Length'] == str(len(response.content))
+    assert response['ETag'] == 'W/"v1"'
+    assert response['Vary'] == 'Accept-Encoding'
+
+
+def test_gzip_when_brotli_refused():
+    response = compress(
+        factory.get('/api/recipes/', HTTP_ACCEPT_ENCODING='gzip, br;q=0'),
+        json_response()
+    )
+    assert response['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.content).startswith(b'{"name": "a')
+
+
+@pytest.mark.parametrize('path, encoding, response', (
+    # Меньше COMPRESSION_MIN_SIZE
+    ('/api/recipes/', 'br', json_response(10)),
+    # Сжатие выключено для админки
+    ('/admin/', 'br', json_response()),
+    # Клиент не принимает сжатие
+    ('/api/recipes/', 'identity', json_response()),
+))
+def test_not_compressed(path, encoding, response):
+    body = response.content
+    response = compress(
+        factory.get(path, HTTP_ACCEPT_ENCODING=encoding), response
+    )
+    assert not response.has_header('Content-Encoding')
+    assert response.content == body
+
+
+def test_not_compressible_type():
+    response = HttpResponse(b'\x89PNG' * 1000, content_type='image/png')
+    response = compress(
+        factory.get('/media/a.png', HTTP_ACCEPT_ENCODING='br'), response
+    )
+    assert not response.has_header('Content-Encoding')
+    assert not response.has_header('Vary')
+
+
+def test_streaming_is_flushed_per_chunk(settings):
+    settings.COMPRESSION_MIN_SIZE = 100
+    chunks = [b'[' + b'1,' * 100, b'2,' * 100, b'3]']
+    response = compress(
+        factory.get('/api/recipes/', HTTP_ACCEPT_ENCODING='gzip'),
+        StreamingHttpResponse(chunks, content_type='application/json')
+    )
+    assert response['Content-Encoding'] == 'gzip'
+    assert not response.has_header('Content-Length')
+    parts = list(response.streaming_content)
+    # Каждый кусок больше порога уходит клиенту сразу
+    assert len([part for part in parts if part]) >= 3
+    assert gzip.decompress(b''.join(parts)) == b''.join(chunks)
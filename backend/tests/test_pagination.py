@@ -0,0 +1,59 @@
+from base64 import urlsafe_b64encode
+from datetime import datetime, timezone
+
+import pytest
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import ChangesPagination, FeedPagination
+
+factory = APIRequestFactory()
+MOMENT = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def decode(pagination, cursor):
+    request = Request(factory.get(
+        '/', {pagination.cursor_query_param: cursor}
+    ))
+    return pagination.decode_cursor(request)
+
+
+def encode_raw(text):
+    return urlsafe_b64encode(text.encode()).decode()
+
+
+def test_feed_cursor_round_trip():
+    pagination = FeedPagination()
+    position = (MOMENT, 42)
+    assert decode(pagination, pagination.encode_cursor(position)) == position
+
+
+def test_changes_cursor_round_trip():
+    pagination = ChangesPagination()
+    position = ((2 ** 40 + 7, 42), MOMENT)
+    assert decode(pagination, pagination.encode_cursor(position)) == position
+
+
+def test_legacy_changes_cursor():
+    """Курсор до transaction_id: только id и время выдачи"""
+    cursor = encode_raw(f'42,{MOMENT.isoformat()}')
+    assert decode(ChangesPagination(), cursor) == ((0, 42), MOMENT)
+
+
+def test_missing_cursor():
+    assert FeedPagination().decode_cursor(Request(factory.get('/'))) is None
+
+
+@pytest.mark.parametrize('pagination, cursor', (
+    (FeedPagination(), '!!!'),
+    (FeedPagination(), encode_raw('42')),
+    (FeedPagination(), encode_raw('вчера,42')),
+    (FeedPagination(), encode_raw(f'{MOMENT.isoformat()},x')),
+    (ChangesPagination(), encode_raw(f'1,2,3,{MOMENT.isoformat()}')),
+    (ChangesPagination(), encode_raw('1,2,вчера')),
+    (ChangesPagination(), urlsafe_b64encode(b'\xff,\xfe').decode()),
+))
+def test_invalid_cursor(pagination, cursor):
+    with pytest.raises(NotFound):
+        decode(pagination, cursor)
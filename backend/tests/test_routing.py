@@ -0,0 +1,109 @@
+import time
+
+import pytest
+from django.conf import settings
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from backend.middleware import ReplicaRoutingMiddleware
+from tags.models import Tag
+from users.models import User
+
+factory = RequestFactory()
+
+
+def route(request):
+    """Базы, которые роутер выбирает для чтения и записи внутри запроса"""
+    routed = {}
+
+    def view(request):
+        routed['read'] = Tag.objects.all().db
+        routed['write'] = router.db_for_write(Tag)
+        return HttpResponse()
+
+    response = ReplicaRoutingMiddleware(view)(request)
+    return routed, response
+
+
+def test_get_reads_from_replica():
+    routed, _ = route(factory.get('/api/tags/'))
+    assert routed['read'] == 'replica'
+    assert routed['write'] == 'default'
+    # Вне запроса чтение снова идёт в default
+    assert Tag.objects.all().db == 'default'
+
+
+def test_write_goes_to_default():
+    routed, response = route(factory.post('/api/recipes/'))
+    assert routed == {'read': 'default', 'write': 'default'}
+    assert settings.DATABASE_PRIMARY_COOKIE_NAME in response.cookies
+
+
+def test_cookie_pins_reads_to_default():
+    request = factory.get('/api/recipes/')
+    request.COOKIES[settings.DATABASE_PRIMARY_COOKIE_NAME] = str(
+        int(time.time()) + settings.DATABASE_REPLICA_STICKY_SECONDS
+    )
+    routed, _ = route(request)
+    assert routed['read'] == 'default'
+
+    request.COOKIES[settings.DATABASE_PRIMARY_COOKIE_NAME] = str(
+        int(time.time()) - 1
+    )
+    routed, _ = route(request)
+    assert routed['read'] == 'replica'
+
+
+def batch(client, paths, parallel=False, **extra):
+    return client.post(
+        '/api/batch/',
+        {'requests': paths, 'parallel': parallel},
+        content_type='application/json',
+        **extra
+    )
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_batch_reads_from_replica_without_pinning(client):
+    with CaptureQueriesContext(connections['replica']) as replica:
+        response = batch(client, ['/api/tags/'])
+    assert response.status_code == 200
+    assert response.json()['results'][0]['status'] == 200
+    assert settings.DATABASE_PRIMARY_COOKIE_NAME not in response.cookies
+    assert any('tags_tag' in query['sql'] for query in replica)
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_batch_respects_pin(client):
+    client.cookies[settings.DATABASE_PRIMARY_COOKIE_NAME] = str(
+        int(time.time()) + settings.DATABASE_REPLICA_STICKY_SECONDS
+    )
+    with CaptureQueriesContext(connections['replica']) as replica:
+        with CaptureQueriesContext(connections['default']) as default:
+            batch(client, ['/api/tags/'])
+    assert not replica.captured_queries
+    assert any('tags_tag' in query['sql'] for query in default)
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db(transaction=True, databases='__all__')
+@pytest.mark.parametrize('parallel', (False, True))
+def test_batch_subrequests_use_sender(client, parallel):
+    user = User.objects.create_user(
+        username='cook', email='cook@example.com', password='secret-pass'
+    )
+    token = Token.objects.create(user=user)
+    response = batch(
+        client, ['/api/users/me/', '/api/tags/'], parallel,
+        HTTP_AUTHORIZATION=f'Token {token.key}'
+    )
+    me, tags = response.json()['results']
+    assert me['status'] == 200
+    assert me['body']['username'] == 'cook'
+    assert tags['status'] == 200
+    assert settings.DATABASE_PRIMARY_COOKIE_NAME not in response.cookies
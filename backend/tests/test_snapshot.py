@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from django.db import transaction
+
+from ingredients.models import Ingredient
+from ingredients.snapshot import (POINTER_NAME, get_snapshot_dir,
+                                  get_snapshot_path, get_snapshot_version,
+                                  get_version_files)
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db(transaction=True)
+def test_pointer_dropped_after_commit():
+    version = get_snapshot_version()
+    pointer = os.path.join(get_snapshot_dir(), POINTER_NAME)
+    with transaction.atomic():
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        assert os.path.exists(pointer)
+        assert get_snapshot_version() == version
+    assert not os.path.exists(pointer)
+    assert get_snapshot_version() != version
+
+
+def add_ingredient(name):
+    with transaction.atomic():
+        Ingredient.objects.create(name=name, measurement_unit='г')
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db(transaction=True)
+def test_previous_version_kept_for_grace_period(settings):
+    settings.SNAPSHOTS_KEEP_SECONDS = 60
+    first = get_snapshot_version()
+    add_ingredient('соль')
+    second = get_snapshot_version()
+    assert os.path.exists(get_snapshot_path(first))
+
+    # Через SNAPSHOTS_KEEP_SECONDS после замены файлы первой версии
+    # удаляются, второй - остаются
+    for path in get_version_files(first):
+        if os.path.exists(path):
+            os.utime(path, (0, 0))
+    add_ingredient('перец')
+    third = get_snapshot_version()
+    assert not os.path.exists(get_snapshot_path(first))
+    assert os.path.exists(get_snapshot_path(second))
+    assert os.path.exists(get_snapshot_path(third))
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_view_rebuilds_missing_version(client, monkeypatch):
+    version = get_snapshot_version()
+    # Версия, файлы которой удалили после чтения указателя
+    monkeypatch.setattr(
+        'api.views.get_snapshot_version', lambda: 'deadbeefdeadbeef'
+    )
+    response = client.get('/api/ingredients/snapshot/')
+    assert response.status_code == 200
+    assert response['ETag'] == f'"{version}"'
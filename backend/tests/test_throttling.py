@@ -0,0 +1,130 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from api.throttling import CostThrottle
+
+factory = RequestFactory()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class View:
+    action = 'list'
+    throttle_costs = {'list': 1, 'heavy': 3, 'huge': 100}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def throttle(clock):
+    # 4 жетона в минуту: жетон пополняется за 15 секунд
+    throttle = type('Throttle', (CostThrottle,), {'rate': '4/min'})()
+    throttle.timer = clock
+    return throttle
+
+
+def make_request(**meta):
+    request = factory.get('/api/recipes/', REMOTE_ADDR='10.0.0.1', **meta)
+    request.user = AnonymousUser()
+    return request
+
+
+def allowed(throttle, count, view=None, request=None):
+    return [
+        throttle.allow_request(request or make_request(), view or View())
+        for _ in range(count)
+    ]
+
+
+def test_burst_up_to_bucket_size(throttle):
+    assert allowed(throttle, 5) == [True] * 4 + [False]
+
+
+def test_retry_after_and_refund(throttle, clock):
+    allowed(throttle, 4)
+    assert allowed(throttle, 1) == [False]
+    assert throttle.wait() == 15
+    assert allowed(throttle, 1) == [False]
+    # Отклонённые запросы не тратят жетоны: через 15 секунд проходит один
+    clock.now += 15
+    assert allowed(throttle, 2) == [True, False]
+
+
+def test_refill(throttle, clock):
+    allowed(throttle, 4)
+    clock.now += 30
+    assert allowed(throttle, 3) == [True, True, False]
+    # После простоя ведро полное, но не больше своего размера
+    clock.now += 3600
+    assert allowed(throttle, 5) == [True] * 4 + [False]
+
+
+def test_cost(throttle):
+    view = View()
+    view.action = 'heavy'
+    assert allowed(throttle, 2, view) == [True, False]
+    view.action = 'retrieve'
+    assert allowed(throttle, 10, view) == [True] * 10
+
+
+def test_cost_is_capped_by_bucket(throttle):
+    view = View()
+    view.action = 'huge'
+    assert allowed(throttle, 2, view) == [True, False]
+
+
+def test_add_on_miss_race(throttle, clock):
+    """Ключ появился между неудачным incr и add в другом воркере"""
+    key = throttle.get_cache_key(make_request(), View())
+    increment = 15000
+    now = int(clock.now * 1000)
+
+    class RacingCache:
+        def __init__(self):
+            self.raced = False
+
+        def incr(self, key, delta):
+            if not self.raced:
+                self.raced = True
+                cache.add(key, now + increment)
+                raise ValueError
+            return cache.incr(key, delta)
+
+        def __getattr__(self, name):
+            return getattr(cache, name)
+
+    throttle.cache = RacingCache()
+    assert allowed(throttle, 1) == [True]
+    # Учтены оба запроса: свой и запрос другого воркера
+    assert cache.get(key) == now + 2 * increment
+
+
+def test_spoofed_forwarded_for_is_ignored(throttle, settings):
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK, 'NUM_PROXIES': 1
+    }
+    # Прокси дописывает реальный адрес клиента в конец заголовка
+    requests = [
+        make_request(HTTP_X_FORWARDED_FOR=f'192.0.2.{n}, 203.0.113.7')
+        for n in range(5)
+    ]
+    assert [
+        throttle.allow_request(request, View()) for request in requests
+    ] == [True] * 4 + [False]
+    assert throttle.get_ident(requests[0]) == '203.0.113.7'
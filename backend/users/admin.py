@@ -1,21 +1,49 @@
 from django.contrib import admin
 
+from backend.paginator import EstimatedCountPaginator
+from recipes.deletion import SoftDeleteAdminMixin, delete_users
+from recipes.feed import recount_followers
+
 from .models import Follow, User
 
 
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('username', 'first_name', 'last_name', 'email')
-    search_fields = ('username',)
-    list_filter = ('username', 'email')
-    emppty_value_display = '-пусто-'
+    search_fields = ('^username', '^email')
+    list_filter = ('is_staff', 'is_active', 'is_deleted')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+    def delete_queryset(self, request, queryset):
+        delete_users(queryset)
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user',)
+    list_select_related = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        author_ids = {obj.author_id}
+        if change and 'author' in form.changed_data:
+            author_ids.add(form.initial['author'])
+        super().save_model(request, obj, form, change)
+        recount_followers(author_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recount_followers([obj.author_id])
+
+    def delete_queryset(self, request, queryset):
+        author_ids = set(queryset.values_list('author_id', flat=True))
+        super().delete_queryset(request, queryset)
+        recount_followers(author_ids)
+
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Follow, FollowAdmin)
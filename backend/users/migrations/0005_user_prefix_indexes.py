@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Индексы для поиска пользователей по началу username и email"""
+
+    dependencies = [
+        ('users', '0004_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX user_username_prefix_idx '
+            'ON users_user (UPPER(username::text) text_pattern_ops);',
+            'DROP INDEX user_username_prefix_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX user_email_prefix_idx '
+            'ON users_user (UPPER(email::text) text_pattern_ops);',
+            'DROP INDEX user_email_prefix_idx;',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.15 on 2026-10-19 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, help_text='Скрыт из API, удаляется командой purge_deleted', verbose_name='Удалён'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['id'], name='user_deleted_idx'),
+        ),
+    ]
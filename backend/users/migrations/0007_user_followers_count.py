@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Число подписчиков, обновляется при подписке и отписке', verbose_name='Подписчиков'),
+        ),
+        migrations.RunSQL(
+            'UPDATE users_user SET followers_count = follow.count '
+            'FROM (SELECT author_id, count(*) AS count FROM users_follow '
+            'GROUP BY author_id) AS follow '
+            'WHERE users_user.id = follow.author_id;',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -33,12 +33,29 @@ class User(AbstractUser):
     )
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Удалён',
+        help_text='Скрыт из API, удаляется командой purge_deleted'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+        help_text='Число подписчиков, обновляется при подписке и отписке'
+    )
 
     @property
     def full_name(self):
         return '%s %s' % (self.first_name, self.last_name)
 
     class Meta:
+        indexes = [models.Index(
+            fields=('id',),
+            condition=models.Q(is_deleted=True),
+            name='user_deleted_idx'
+        )]
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
 
@@ -68,6 +85,10 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_following'
         )]
+        indexes = [models.Index(
+            fields=('author', 'user'),
+            name='follow_author_user_idx'
+        )]
 
     def ___str___(self) -> str:
         return f'{self.user} подписан на рецепты {self.author}'